@@ -725,7 +725,12 @@ Output Queue Status: {7}
                     del kv_pair["sampleDir"]
 
             for key, value in kv_pair.items():
-                if "replacementType" in key and value in ["file", "mvfile", "seqfile"]:
+                if "replacementType" in key and value in [
+                    "file",
+                    "mvfile",
+                    "seqfile",
+                    "weightedfile",
+                ]:
                     token_num = key[key.find(".") + 1 : key.rfind(".")]
                     if not token_num:
                         continue
@@ -12,7 +12,13 @@ from queue import Empty, Queue
 from threading import Event, Thread
 
 from splunk_eventgen.lib.eventgenconfig import Config
+from splunk_eventgen.lib.eventgencounter import (
+    install_shared_counters,
+    shared_counters,
+)
 from splunk_eventgen.lib.eventgenexceptions import PluginNotLoaded
+from splunk_eventgen.lib.eventgenfile import clear_replacement_files
+from splunk_eventgen.lib.eventgensampleindex import clear_sample_indexes
 from splunk_eventgen.lib.eventgentimer import Timer
 from splunk_eventgen.lib.logging_config import logger
 from splunk_eventgen.lib.outputcounter import OutputCounter
@@ -25,6 +31,9 @@ EVENTGEN_ENGINE_CONF_PATH = os.path.abspath(
 
 
 class EventGenerator(object):
+    # Global settings the worker pools are built from, changing any of them while running needs a full reload
+    _poolSettings = ("generatorWorkers", "disableLoggingQueue")
+
     def __init__(self, args=None):
         """
         This object will allow you to generate and control eventgen.  It should be handed the parse_args object
@@ -42,6 +51,8 @@ class EventGenerator(object):
         self.args = args
         self.workerPool = []
         self.manager = None
+        # Running timers and the settings signature of their sample, keyed by sample
+        self.timers = {}
         self._setup_loggers(args=args)
         # attach to the logging queue
         self.logger.info("Logging Setup Complete.")
@@ -285,6 +296,14 @@ class EventGenerator(object):
             import multiprocessing
 
             self.workerPool = []
+            # integerid and seqfile counters live in shared memory so every worker process draws from the same range
+            for sample in getattr(self.config, "samples", []):
+                for token in sample.tokens:
+                    if token.replacementType in ("integerid", "seqfile"):
+                        counter = token.get_counter()
+                        if counter is not None:
+                            counter.share()
+            counters = shared_counters()
             for worker in range(workercount):
                 # builds a list of tuples to use the map function
                 disable_logging = (
@@ -297,6 +316,7 @@ class EventGenerator(object):
                         self.loggingQueue,
                         self.genconfig,
                         disable_logging,
+                        counters,
                     ),
                 )
                 self.workerPool.append(process)
@@ -362,8 +382,12 @@ class EventGenerator(object):
                 raise e
 
     @staticmethod
-    def _proc_worker_do_work(work_queue, logging_queue, config, disable_logging):
+    def _proc_worker_do_work(
+        work_queue, logging_queue, config, disable_logging, counters=None
+    ):
         genconfig = config
+        if counters:
+            install_shared_counters(counters)
         stopping = genconfig["stopping"]
         root = logging.getLogger()
         root.setLevel(logging.DEBUG)
@@ -503,42 +527,54 @@ class EventGenerator(object):
                         raise e
         return ret
 
+    @staticmethod
+    def _sample_key(sample):
+        return (sample.app, sample.name, sample.filePath)
+
+    def _start_timer(self, s):
+        """Creates the timer of sample s and queues it for the timer threads"""
+        self.logger.info(
+            "Creating timer object for sample '%s' in app '%s'" % (s.name, s.app)
+        )
+        signature = s.getSettingsSignature()
+        # This is where the timer is finally sent to a queue to be processed.  Needs to move to this object.
+        try:
+            t = Timer(
+                1.0,
+                sample=s,
+                config=self.config,
+                genqueue=self.workerQueue,
+                outputqueue=self.outputQueue,
+                loggingqueue=self.loggingQueue,
+                manager=self.manager,
+            )
+        except PluginNotLoaded as pnl:
+            self._load_custom_plugins(pnl)
+            t = Timer(
+                1.0,
+                sample=s,
+                config=self.config,
+                genqueue=self.workerQueue,
+                outputqueue=self.outputQueue,
+                loggingqueue=self.loggingQueue,
+                manager=self.manager,
+            )
+        except Exception as e:
+            raise e
+        self.timers[self._sample_key(s)] = (t, signature)
+        self.sampleQueue.put(t)
+
     def start(self, join_after_start=True):
         self.stop_request.clear()
         self.started = True
         self.config.stopping = False
         self.completed = False
+        self.timers = {}
         if len(self.config.samples) <= 0:
             self.logger.info("No samples found.  Exiting.")
         for s in self.config.samples:
             if s.interval > 0 or s.mode == "replay" or s.end != "0":
-                self.logger.info(
-                    "Creating timer object for sample '%s' in app '%s'"
-                    % (s.name, s.app)
-                )
-                # This is where the timer is finally sent to a queue to be processed.  Needs to move to this object.
-                try:
-                    t = Timer(
-                        1.0,
-                        sample=s,
-                        config=self.config,
-                        genqueue=self.workerQueue,
-                        outputqueue=self.outputQueue,
-                        loggingqueue=self.loggingQueue,
-                    )
-                except PluginNotLoaded as pnl:
-                    self._load_custom_plugins(pnl)
-                    t = Timer(
-                        1.0,
-                        sample=s,
-                        config=self.config,
-                        genqueue=self.workerQueue,
-                        outputqueue=self.outputQueue,
-                        loggingqueue=self.loggingQueue,
-                    )
-                except Exception as e:
-                    raise e
-                self.sampleQueue.put(t)
+                self._start_timer(s)
         if join_after_start:
             self.logger.info("All timers started, joining queue until it's empty.")
             self.join_process()
@@ -601,13 +637,81 @@ class EventGenerator(object):
 
     def reload_conf(self, configfile):
         """
-        This method will allow a user to supply a new .conf file for generation and reload the sample files.
+        This method will allow a user to supply a new .conf file for generation and reload the sample files.  While
+        eventgen is running, only the samples whose settings or sample files changed are restarted.
         :param configfile:
         :return:
         """
-        self._load_config(configfile=configfile)
+        # Samples and their replacement plans are rebuilt by the new config, sample and replacement files may have
+        # changed too
+        clear_replacement_files()
+        clear_sample_indexes()
+        if not (self.started and self._reload_samples(configfile)):
+            self._load_config(configfile=configfile)
         self.logger.debug("Config File Loading Complete.")
 
+    def _reload_samples(self, configfile):
+        """
+        Parses configfile again and diffs its samples against the running ones.  Timers of changed and removed samples
+        are stopped and changed and added samples get new timers, while unchanged samples, the worker pools and the
+        output threads keep running.  Returns False without changing anything that runs when the worker pools have to
+        be rebuilt, a full reload is needed then.
+        """
+        poolSettings = [getattr(self.config, name, None) for name in self._poolSettings]
+        # Config shares its state between instances, so running timers see the new settings as well
+        self.config = Config(
+            configfile, threading="process" if self.args.multiprocess else "thread"
+        )
+        self.config.parse()
+        if getattr(self.args, "generators", None):
+            # The pools were built with the generatorWorkers from the command line
+            self.config.generatorWorkers = self.args.generators
+        if (self.config.threading == "process" and not self.args.multiprocess) or [
+            getattr(self.config, name, None) for name in self._poolSettings
+        ] != poolSettings:
+            self.logger.info("Worker settings changed, reloading all samples")
+            return False
+
+        samples = []
+        started = []
+        kept = set()
+        for s in self.config.samples:
+            key = self._sample_key(s)
+            running = self.timers.get(key)
+            if running is not None and running[1] == s.getSettingsSignature():
+                # Keep the running sample, it carries the state of its timer and generators
+                samples.append(running[0].sample)
+                kept.add(key)
+                continue
+            if self.args.multiprocess and any(
+                token.replacementType in ("integerid", "seqfile") for token in s.tokens
+            ):
+                # Worker processes only share the counters that existed when they were started
+                self.logger.info(
+                    "Sample '%s' has shared counters, reloading all samples" % s.name
+                )
+                return False
+            samples.append(s)
+            if s.interval > 0 or s.mode == "replay" or s.end != "0":
+                started.append(s)
+        self.config.samples = samples
+
+        for key, (timer, _) in list(self.timers.items()):
+            if key not in kept:
+                self.logger.info(
+                    "Stopping timer for sample '%s' in app '%s'"
+                    % (timer.sample.name, timer.sample.app)
+                )
+                timer.stopping = True
+                del self.timers[key]
+        for s in started:
+            self._start_timer(s)
+        self.logger.info(
+            "Reloaded config, kept %d samples running and started %d"
+            % (len(kept), len(started))
+        )
+        return True
+
     def check_running(self):
         """
         :return: if eventgen is running, return True else False
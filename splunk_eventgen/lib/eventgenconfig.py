@@ -8,10 +8,6 @@ import re
 import types
 from configparser import RawConfigParser
 
-import six.moves.urllib.error
-import six.moves.urllib.parse
-import six.moves.urllib.request
-
 from splunk_eventgen.lib.eventgenexceptions import FailedLoadingPlugin, PluginNotLoaded
 from splunk_eventgen.lib.eventgensamples import Sample
 from splunk_eventgen.lib.eventgentoken import Token
@@ -150,6 +146,9 @@ class Config(object):
         "extendIndexes",
         "disableLoggingQueue",
         "splitSample",
+        "streamSample",
+        "stateDir",
+        "sampleCacheDir",
     ]
     _validTokenTypes = {"token": 0, "replacementType": 1, "replacement": 2}
     _validHostTokens = {"token": 0, "replacement": 1}
@@ -162,6 +161,7 @@ class Config(object):
         "file",
         "mvfile",
         "seqfile",
+        "weightedfile",
         "integerid",
     ]
     validOutputModes = []
@@ -187,6 +187,7 @@ class Config(object):
         "sequentialTimestamp",
         "disableLoggingQueue",
         "syslogAddHeader",
+        "streamSample",
     ]
     _jsonSettings = [
         "hourOfDayRate",
@@ -239,6 +240,10 @@ class Config(object):
         "maxIntervalsBeforeFlush",
         "autotimestamp",
         "splitSample",
+        "seed",
+        "streamSample",
+        "stateDir",
+        "sampleCacheDir",
     ]
     _complexSettings = {
         "sampletype": ["raw", "csv"],
@@ -601,6 +606,25 @@ class Config(object):
                     ):
                         logger.error("Token at index %s invalid" % i)
                         deleteidx.append(i)
+                    else:
+                        # Compile the token regex once here so a bad pattern is reported at config time
+                        # instead of failing on every event
+                        try:
+                            t.compile()
+                        except ValueError as e:
+                            logger.error(
+                                "Token at index %s invalid in stanza '%s': %s"
+                                % (i, stanza, e)
+                            )
+                            deleteidx.append(i)
+                if isinstance(s.hostToken, Token) and s.hostToken.token is not None:
+                    try:
+                        s.hostToken.compile()
+                    except ValueError as e:
+                        logger.error(
+                            "Host token invalid in stanza '%s': %s" % (stanza, e)
+                        )
+                        s.hostToken = None
                 newtokens = []
                 for i in range(0, len(s.tokens)):
                     if i not in deleteidx:
@@ -749,24 +773,32 @@ class Config(object):
                     if s.mode == "replay" and not s.end:
                         s.end = 1
 
-            # Now that we know where samples will be written,
-            # Loop through tokens and load state for any that are integerid replacementType
+            if s.stateDir:
+                try:
+                    os.makedirs(s.stateDir, exist_ok=True)
+                except OSError as e:
+                    logger.error(
+                        "Could not create stateDir '%s' for sample '%s': %s"
+                        % (s.stateDir, s.name, e)
+                    )
+            # Loop through tokens and load state for any that are integerid replacementType, from stateDir if it's set,
+            # or else from the sample directory earlier versions saved it in
             for token in s.tokens:
                 if token.replacementType == "integerid":
-                    try:
-                        stateFile = open(
-                            os.path.join(
-                                s.sampleDir,
-                                "state."
-                                + six.moves.urllib.request.pathname2url(token.token),
-                            ),
-                            "r",
-                        )
-                        token.replacement = stateFile.read()
-                        stateFile.close()
-                    # The file doesn't exist, use the default value in the config
-                    except (IOError, ValueError):
-                        token.replacement = token.replacement
+                    stateFiles = [s.getLegacyStateFile(token)]
+                    if s.stateDir:
+                        # The counter checkpoints its state to this file as it hands out IDs
+                        token.stateFile = s.getStateFile(token)
+                        stateFiles.insert(0, token.stateFile)
+                    for path in stateFiles:
+                        try:
+                            stateFile = open(path, "r")
+                            token.replacement = stateFile.read()
+                            stateFile.close()
+                            break
+                        # The file doesn't exist, use the default value in the config
+                        except (IOError, ValueError):
+                            token.replacement = token.replacement
 
             if os.path.exists(s.sampleDir):
                 sampleFiles = os.listdir(s.sampleDir)
@@ -1234,6 +1266,8 @@ class Config(object):
 
         logger.info("Using random seed {}".format(value))
         random.seed(value)
+        # Generator runs derive their own random streams from it
+        return value
 
     def _buildConfDict(self):
         """Build configuration dictionary that we will use """
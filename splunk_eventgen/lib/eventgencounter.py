@@ -0,0 +1,127 @@
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import deque
+
+from splunk_eventgen.lib.logging_config import logger
+
+# Counters moved into shared memory, keyed by BlockCounter.key.  Worker processes get them through
+# install_shared_counters(), so pickled copies of a token all count from the same place.
+_sharedCounters = {}
+
+
+def shared_counters():
+    """Returns the shared counters of this process, to be passed to generator worker processes"""
+    return dict(_sharedCounters)
+
+
+def install_shared_counters(counters):
+    """Makes counters shared by the parent process available to tokens in this process"""
+    _sharedCounters.update(counters)
+
+
+class BlockCounter(object):
+    """
+    Counter behind integerid and seqfile tokens.  Values are handed out to each thread in blocks, either reserved
+    for a whole generator run with reserve() or blockSize at a time, so generator threads only take a lock once per
+    block, and every value is unique no matter how many threads or processes draw from the counter.  After share()
+    the counter lives in shared memory and worker processes allocate their blocks from it too.
+
+    If stateFile is set, which it only is for samples with a stateDir, the end of the last allocated block is written
+    to it every time a block is allocated, so a restarted eventgen never hands out a value twice.
+    """
+
+    def __init__(self, start=0, blockSize=100, stateFile=None):
+        self.key = uuid.uuid4().hex
+        self.blockSize = blockSize
+        self.stateFile = stateFile
+        self._next = start
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __getstate__(self):
+        # Locks and the blocks of this process's threads stay here
+        state = self.__dict__.copy()
+        del state["_lock"]
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def share(self):
+        """Moves the counter into shared memory, must be called before worker processes are started"""
+        with self._lock:
+            shared = _sharedCounters.get(self.key)
+            if shared is None:
+                _sharedCounters[self.key] = multiprocessing.Value("q", self._next)
+
+    @property
+    def value(self):
+        """The first value which has not been allocated yet"""
+        shared = _sharedCounters.get(self.key)
+        if shared is None:
+            return self._next
+        return shared.value
+
+    def _allocate(self, size):
+        shared = _sharedCounters.get(self.key)
+        lock = self._lock if shared is None else shared.get_lock()
+        with lock:
+            if shared is None:
+                start = self._next
+                self._next = start + size
+            else:
+                start = shared.value
+                shared.value = start + size
+            if self.stateFile:
+                self._write(start + size)
+        return start, start + size
+
+    def _blocks(self):
+        try:
+            return self._local.blocks
+        except AttributeError:
+            blocks = self._local.blocks = deque()
+            return blocks
+
+    def reserve(self, count):
+        """Makes sure the calling thread has at least count values allocated"""
+        blocks = self._blocks()
+        missing = count - sum(end - position for position, end in blocks)
+        if missing > 0:
+            blocks.append(list(self._allocate(missing)))
+
+    def next(self):
+        blocks = self._blocks()
+        while blocks:
+            block = blocks[0]
+            if block[0] < block[1]:
+                block[0] += 1
+                return block[0] - 1
+            blocks.popleft()
+        start, end = self._allocate(self.blockSize)
+        blocks.append([start + 1, end])
+        return start
+
+    def save(self):
+        """Writes the first unallocated value to stateFile"""
+        if not self.stateFile:
+            return
+        shared = _sharedCounters.get(self.key)
+        lock = self._lock if shared is None else shared.get_lock()
+        with lock:
+            self._write(self.value)
+
+    def _write(self, value):
+        # Write then rename, so a crash never leaves a truncated state file behind
+        temp = "%s.%d.tmp" % (self.stateFile, os.getpid())
+        try:
+            with open(temp, "w") as f:
+                f.write(str(value))
+            os.replace(temp, self.stateFile)
+        except (IOError, OSError) as e:
+            logger.error("Could not save state file '%s': %s" % (self.stateFile, e))
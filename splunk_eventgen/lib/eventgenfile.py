@@ -0,0 +1,189 @@
+import mmap
+import os
+import random
+import re
+import stat
+import threading
+from array import array
+
+from splunk_eventgen.lib.logging_config import logger
+
+_NEWLINE_RE = re.compile(b"\n")
+
+# Replacement files shared by every token in this process, keyed by absolute path
+_replacementFiles = {}
+_replacementFilesLock = threading.Lock()
+
+
+def private_directory(path):
+    """
+    Creates directory path with mode 0700 if it doesn't exist yet.  Returns True if path is a directory owned by the
+    current user which nobody else can write to, so files found in it can be trusted, otherwise logs why not and
+    returns False.
+    """
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        st = os.lstat(path)
+    except (IOError, OSError) as e:
+        logger.error("Could not create directory '%s': %s" % (path, e))
+        return False
+    if not stat.S_ISDIR(st.st_mode):
+        logger.error("Not using '%s', it is not a directory" % path)
+        return False
+    # Ownership and modes can't be checked the same way on Windows
+    if hasattr(os, "getuid") and (
+        st.st_uid != os.getuid() or stat.S_IMODE(st.st_mode) != 0o700
+    ):
+        logger.error(
+            "Not using directory '%s', it must be owned by the current user and have mode 0700"
+            % path
+        )
+        return False
+    return True
+
+
+class AliasTable(object):
+    """
+    Walker alias table over a list of weights.  Built once in O(n), after which pick() returns an index with
+    probability proportional to its weight in O(1), however many weights there are.
+    """
+
+    def __init__(self, weights):
+        count = len(weights)
+        total = float(sum(weights))
+        self._prob = array("d", [0.0] * count)
+        self._alias = array("L", range(count))
+        scaled = [weight * count / total for weight in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self._prob[less] = scaled[less]
+            self._alias[less] = more
+            scaled[more] = (scaled[more] + scaled[less]) - 1.0
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+        # Whatever is left is 1 give or take float rounding
+        for i in large + small:
+            self._prob[i] = 1.0
+
+    def __len__(self):
+        return len(self._prob)
+
+    def pick(self, rng=random):
+        position = rng.random() * len(self._prob)
+        index = int(position)
+        if position - index < self._prob[index]:
+            return index
+        return self._alias[index]
+
+
+class ReplacementFile(object):
+    """
+    Read only view of a file, mvfile, seqfile or weightedfile replacement file.  The file is memory mapped and only an
+    array of line offsets is built, so tokens reading the same file share one copy, and worker processes share the OS
+    page cache instead of each holding every line as a Python string.  Column splits for mvfile tokens are cached per
+    line.
+    """
+
+    # Lines kept split into columns before the cache is started over
+    splitCacheSize = 65536
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = array("Q", [0])
+        self._offsets.extend(m.end() for m in _NEWLINE_RE.finditer(self._mmap))
+        # A trailing newline doesn't start another line
+        if self._offsets[-1] == len(self._mmap):
+            self._offsets.pop()
+        self._splits = {}
+        self._aliasTable = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def contains(self, text):
+        """Returns True if text appears anywhere in the file"""
+        return self._mmap.find(text.encode("utf-8")) >= 0
+
+    def line(self, index):
+        """Returns line number index without surrounding whitespace"""
+        start = self._offsets[index]
+        if index + 1 < len(self._offsets):
+            end = self._offsets[index + 1]
+        else:
+            end = len(self._mmap)
+        return self._mmap[start:end].decode("utf-8", errors="replace").strip()
+
+    def columns(self, index):
+        """Returns line number index split into its comma separated columns"""
+        try:
+            return self._splits[index]
+        except KeyError:
+            if len(self._splits) >= self.splitCacheSize:
+                self._splits.clear()
+            columns = self.line(index).split(",")
+            self._splits[index] = columns
+            return columns
+
+    def alias_table(self):
+        """
+        Returns the AliasTable for a weightedfile, where the last column of every line is its weight, building it on
+        first use.  Lines with a missing, invalid or negative weight are never picked.  Returns None and logs an error
+        if no line has a weight.
+        """
+        if self._aliasTable is None:
+            with self._lock:
+                if self._aliasTable is None:
+                    weights = []
+                    for index in range(len(self)):
+                        try:
+                            weight = float(self.line(index).rsplit(",", 1)[1])
+                        except (IndexError, ValueError):
+                            weight = 0.0
+                        weights.append(weight if 0 < weight < float("inf") else 0.0)
+                    if sum(weights) <= 0:
+                        logger.error(
+                            "Replacement file '%s' has no weighted lines; will not replace"
+                            % self.path
+                        )
+                        return None
+                    self._aliasTable = AliasTable(weights)
+        return self._aliasTable
+
+
+def clear_replacement_files():
+    """Forgets every mapped replacement file, so they are read again the next time a token uses them"""
+    with _replacementFilesLock:
+        _replacementFiles.clear()
+
+
+def get_replacement_file(path):
+    """
+    Returns the shared ReplacementFile for path, opening it on first use.  Returns None and logs an error if the file
+    does not exist or is empty.
+    """
+    path = os.path.abspath(path)
+    try:
+        return _replacementFiles[path]
+    except KeyError:
+        pass
+    with _replacementFilesLock:
+        if path in _replacementFiles:
+            return _replacementFiles[path]
+        if not os.path.isfile(path):
+            logger.error("File '%s' does not exist" % path)
+            return None
+        if os.path.getsize(path) == 0:
+            logger.error("Replacement file '%s' is empty; will not replace" % path)
+            return None
+        logger.debug("Mapping replacement file %s" % path)
+        replacementFile = ReplacementFile(path)
+        _replacementFiles[path] = replacementFile
+        return replacementFile
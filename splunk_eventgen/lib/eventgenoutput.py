@@ -19,6 +19,18 @@ class Output(object):
         self.MAXQUEUELENGTH = sample.maxQueueLength
         self._queue = []
         self.output_counter = None
+        # Fields of every event added with send(), copied into each event instead of being looked up every time
+        self._fields = {
+            "_raw": None,
+            "index": sample.index,
+            "source": sample.source,
+            "sourcetype": sample.sourcetype,
+            "host": sample.host,
+            "hostRegex": sample.hostRegex,
+            "_time": None,
+        }
+        self._lastts = None
+        self._lasttime = None
 
     def __str__(self):
         """Only used for debugging, outputs a pretty printed representation of this output"""
@@ -52,17 +64,13 @@ class Output(object):
             if self._sample.timestamp is not None
             else self._sample.now()
         )
-        self._queue.append(
-            {
-                "_raw": msg,
-                "index": self._sample.index,
-                "source": self._sample.source,
-                "sourcetype": self._sample.sourcetype,
-                "host": self._sample.host,
-                "hostRegex": self._sample.hostRegex,
-                "_time": int(time.mktime(ts.timetuple())),
-            }
-        )
+        if ts != self._lastts:
+            self._lastts = ts
+            self._lasttime = int(time.mktime(ts.timetuple()))
+        event = self._fields.copy()
+        event["_raw"] = msg
+        event["_time"] = self._lasttime
+        self._queue.append(event)
 
         if len(self._queue) >= self.MAXQUEUELENGTH:
             self.flush()
@@ -0,0 +1,392 @@
+import json
+import string
+
+from splunk_eventgen.lib.eventgenfile import get_replacement_file
+from splunk_eventgen.lib.eventgenrandom import STRING_ALPHABET
+from splunk_eventgen.lib.eventgentimeformat import strftime
+from splunk_eventgen.lib.eventgentoken import (
+    FLOAT_RE,
+    HEX_RE,
+    INTEGER_RE,
+    LIST_RE,
+    STRING_RE,
+)
+from splunk_eventgen.lib.logging_config import logger
+
+# Characters the output of random and rated tokens is made of
+_RANDOM_CHARS = {
+    "ipv4": string.digits + ".",
+    "ipv6": string.hexdigits + ":",
+    "mac": string.hexdigits + ":",
+    "guid": string.hexdigits + "-",
+}
+_INTEGER_CHARS = string.digits + "-"
+_FLOAT_CHARS = string.digits + ".-+e"
+
+# Characters strftime directives expand to, directives not in here may expand to anything
+_DIRECTIVE_CHARS = dict.fromkeys("CdefGgHIjmMsSuUVwWyY", string.digits)
+_DIRECTIVE_CHARS.update(dict.fromkeys("aAbBhpP", string.ascii_letters))
+_DIRECTIVE_CHARS.update({"z": string.digits + "+-:", "%": "%", "n": "\n", "t": "\t"})
+
+_REGEX_SPECIAL = ".^$*+?{}[]()|"
+
+
+def literal_prefix(pattern):
+    """
+    Returns the literal text every match of the regular expression pattern starts with, which may be empty.  Only
+    plain and escaped characters are taken, and a pattern with any alternation has no prefix.
+    """
+    if "|" in pattern:
+        return ""
+    prefix = []
+    position = 0
+    while position < len(pattern):
+        char = pattern[position]
+        step = 1
+        if char == "\\":
+            if position + 1 >= len(pattern) or pattern[position + 1].isalnum():
+                break
+            char = pattern[position + 1]
+            step = 2
+        elif char in _REGEX_SPECIAL:
+            break
+        # A quantified character may not be there at all
+        if position + step < len(pattern) and pattern[position + step] in "*+?{":
+            break
+        prefix.append(char)
+        position += step
+    return "".join(prefix)
+
+
+def _timestamp_chars(fmt):
+    chars = set()
+    position = 0
+    while position < len(fmt):
+        if fmt[position] == "%":
+            directive = fmt[position + 1 : position + 2]
+            if directive not in _DIRECTIVE_CHARS:
+                return None
+            chars.update(_DIRECTIVE_CHARS[directive])
+            position += 2
+        else:
+            chars.add(fmt[position])
+            position += 1
+    return "".join(chars)
+
+
+def _output_chars(token):
+    """Returns the characters every value of a token is made of, or None if they aren't known in advance"""
+    replacement = token.replacement
+    if replacement is None:
+        return None
+    if token.replacementType in ("timestamp", "replaytimestamp"):
+        return _timestamp_chars(replacement)
+    if token.replacementType == "integerid":
+        return _INTEGER_CHARS
+    if token.replacementType not in ("random", "rated"):
+        return None
+    if replacement.lower() in _RANDOM_CHARS:
+        return _RANDOM_CHARS[replacement.lower()]
+    if INTEGER_RE.match(replacement):
+        return _INTEGER_CHARS
+    if FLOAT_RE.match(replacement):
+        return _FLOAT_CHARS
+    if STRING_RE.match(replacement):
+        return STRING_ALPHABET
+    if HEX_RE.match(replacement):
+        return string.hexdigits.upper()
+    listMatch = LIST_RE.match(replacement)
+    if listMatch:
+        try:
+            return "".join(str(value) for value in json.loads(listMatch.group(1)))
+        except ValueError:
+            return None
+    return None
+
+
+class LinePlan(object):
+    """
+    Replacement plan for a single sample line.  The line is stored as the literal text between token matches, plus
+    the index of the token that fills each gap.  Rendering an event only calls each token once and joins the pieces.
+    """
+
+    __slots__ = ["literals", "slots", "originals", "olds"]
+
+    def __init__(self, literals, slots, originals, olds):
+        # literals has one more entry than slots, the text before the first dynamic match and after every one, with
+        # the replacements of static tokens already in it
+        self.literals = literals
+        # index into the plan's tokens for every match, in position order
+        self.slots = slots
+        # original text of every match, used when a token returns no replacement
+        self.originals = originals
+        # (token index, text of the token's first full match) in token order
+        self.olds = olds
+
+    def render(
+        self,
+        tokens,
+        et=None,
+        lt=None,
+        s=None,
+        pivot_timestamp=None,
+        mvhash=None,
+        rate_factor=None,
+        rng=None,
+    ):
+        literals = self.literals
+        if not self.slots:
+            # Only static tokens matched, the line is already fully baked
+            return literals[0]
+        if mvhash is None:
+            mvhash = {}
+        values = {}
+        for index, old in self.olds:
+            token = tokens[index]
+            if token.replacementType == "replaytimestamp":
+                values[index] = strftime(lt, token.replacement)
+            else:
+                values[index] = token._getReplacement(
+                    old,
+                    et,
+                    lt,
+                    s,
+                    pivot_timestamp=pivot_timestamp,
+                    mvhash=mvhash,
+                    rate_factor=rate_factor,
+                    rng=rng,
+                )
+        parts = [literals[0]]
+        for i, index in enumerate(self.slots):
+            value = values[index]
+            parts.append(value if value is not None else self.originals[i])
+            parts.append(literals[i + 1])
+        return "".join(parts)
+
+
+class ReplacementPlan(object):
+    """
+    Token replacement plan for a sample, built once when the sample is loaded.  Every distinct line is scanned with
+    every token a single time and the match spans are kept as a LinePlan, so generating an event is one join of
+    literal segments and generated values instead of one regex pass and one string copy per token.
+
+    The sequential token loop lets a token match text produced by an earlier token.  A plan can't do that, so lines
+    where matches of different tokens overlap or touch are planned as None and replaced token by token, and the
+    whole plan is disabled when a token matches the replacement of an earlier static token.  Lines are also planned
+    as None when a later token could match the output of a dynamic token: when the later token's pattern doesn't
+    start with literal text, when that text could start inside the dynamic output, or when it could start in the
+    sample text just before it.  Replacement files are searched for the literal text if the plan is given the
+    sample, so it can resolve their paths.
+
+    Static token output never changes, so it is baked into the literal text when a line is compiled and only dynamic
+    tokens are called per event.  The baked line is searched again with every token, and a line where a token
+    matches differently once the static tokens before it are replaced is planned as None as well, like a match
+    spanning a static replacement and the text around it.
+
+    Lines replaced token by token use applicable() to skip the tokens which can't match them.
+
+    If cacheSize is set, no more than that many lines are kept compiled, so streamed samples don't end up with
+    every line of the file in the plan.
+    """
+
+    # Lines kept compiled for a streamed sample before the plan is started over
+    streamCacheSize = 65536
+
+    def __init__(self, tokens, lines=None, cacheSize=None, sample=None):
+        self.tokens = list(tokens)
+        self.cacheSize = cacheSize
+        self._lines = {}
+        self._applicable = {}
+        self._prefixes = [literal_prefix(token.token or "") for token in self.tokens]
+        self._outputs = [self._output(token, sample) for token in self.tokens]
+        self.enabled = not self._has_chained_tokens()
+        if not self.enabled:
+            logger.debug(
+                "Tokens match the output of earlier static tokens, not building a replacement plan"
+            )
+        elif lines:
+            for line in lines:
+                self.compile(line)
+
+    def _has_chained_tokens(self):
+        for i, token in enumerate(self.tokens):
+            if token.replacementType != "static":
+                continue
+            for later in self.tokens[i + 1 :]:
+                if later._search(token.replacement):
+                    return True
+        return False
+
+    @staticmethod
+    def _output(token, sample):
+        # Characters of the token's values, or the path of the replacement file its values come from
+        if token.replacementType in ("file", "mvfile", "seqfile", "weightedfile"):
+            if sample is None:
+                return None
+            replacementPath = token.get_replacement_path(sample)
+            return None if replacementPath is None else (replacementPath[0],)
+        return _output_chars(token)
+
+    def _may_output(self, index, text):
+        """Returns True if a value of token index could contain text"""
+        output = self._outputs[index]
+        if output is None:
+            return True
+        if isinstance(output, tuple):
+            replacementFile = get_replacement_file(output[0])
+            return replacementFile is None or replacementFile.contains(text)
+        return text in output
+
+    def _chains(self, raw, spans):
+        """
+        Returns True if a token could match the output of an earlier dynamic token in raw once it's replaced.  spans
+        are the sorted match spans of every token.
+        """
+        position = 0
+        for outer_start, outer_end, inner_start, inner_end, index in spans:
+            token = self.tokens[index]
+            if token.replacementType != "static" or token.replacement is None:
+                before = raw[position:inner_start]
+                for later in range(index + 1, len(self.tokens)):
+                    prefix = self._prefixes[later]
+                    if not prefix or self._may_output(index, prefix[0]):
+                        return True
+                    # The prefix running on into the dynamic value, or already in front of it with the value
+                    # completing the match, unless the later token matched there to begin with
+                    if any(
+                        before.endswith(prefix[:length])
+                        and self._may_output(index, prefix[length])
+                        for length in range(1, len(prefix))
+                    ):
+                        return True
+                    found = before.find(prefix)
+                    while found >= 0:
+                        if not any(
+                            span[4] == later and span[0] == position + found
+                            for span in spans
+                        ):
+                            return True
+                        found = before.find(prefix, found + 1)
+            position = outer_end
+        return False
+
+    def _baked(self, raw):
+        """Yields the index of every token, the token and the line as the static tokens before it leave it"""
+        line = raw
+        for index, token in enumerate(self.tokens):
+            yield index, token, line
+            if token.replacementType == "static" and token.replacement is not None:
+                line = token.replace(line)
+
+    def _rebaked(self, raw, matched):
+        """
+        Returns True if a token matches the line differently once the static tokens before it are replaced.  matched
+        has the text of every match of every token in raw.
+        """
+        for index, token, line in self._baked(raw):
+            if (
+                line != raw
+                and [m.group(0) for m in token._finditer(line)] != matched[index]
+            ):
+                return True
+        return False
+
+    def matches(self, tokens):
+        """Returns True if this plan was built for exactly the passed list of tokens"""
+        if len(tokens) != len(self.tokens):
+            return False
+        for ours, theirs in zip(self.tokens, tokens):
+            if ours is not theirs:
+                return False
+        return True
+
+    def get(self, raw):
+        """Returns the LinePlan for raw, compiling it on first use, or None if raw must be replaced sequentially"""
+        if not self.enabled:
+            return None
+        try:
+            return self._lines[raw]
+        except KeyError:
+            return self.compile(raw)
+
+    def applicable(self, raw):
+        """
+        Returns the tokens the sequential loop has to run for raw, in order.  A token is skipped if it can't match
+        the line as the tokens before it leave it.  Static replacements are applied while building the list, but
+        the output of a dynamic token isn't known in advance, so every token after the first dynamic one that
+        matches is kept.
+        """
+        try:
+            return self._applicable[raw]
+        except KeyError:
+            pass
+        tokens = []
+        dynamic = False
+        for index, token, line in self._baked(raw):
+            if dynamic:
+                tokens.append(token)
+            elif token._search(line) is not None:
+                tokens.append(token)
+                if token.replacementType != "static" or token.replacement is None:
+                    dynamic = True
+        if self.cacheSize and len(self._applicable) >= self.cacheSize:
+            self._applicable.clear()
+        self._applicable[raw] = tokens
+        return tokens
+
+    def compile(self, raw):
+        if self.cacheSize and len(self._lines) >= self.cacheSize:
+            self._lines.clear()
+        spans = []
+        olds = []
+        matched = []
+        for index, token in enumerate(self.tokens):
+            first = None
+            matched.append([])
+            for match in token._finditer(raw):
+                outer = match.span(0)
+                try:
+                    inner = match.span(1)
+                except IndexError:
+                    inner = outer
+                if inner[0] < 0:
+                    # Capture group didn't participate in the match, leave it to the sequential path
+                    self._lines[raw] = None
+                    return None
+                spans.append((outer[0], outer[1], inner[0], inner[1], index))
+                matched[index].append(match.group(0))
+                if first is None:
+                    first = raw[outer[0] : outer[1]]
+            if first is not None:
+                olds.append((index, first))
+
+        spans.sort()
+        for previous, current in zip(spans, spans[1:]):
+            if current[4] != previous[4] and current[0] <= previous[1]:
+                self._lines[raw] = None
+                return None
+        if self._chains(raw, spans) or self._rebaked(raw, matched):
+            self._lines[raw] = None
+            return None
+
+        literals = [""]
+        slots = []
+        originals = []
+        position = 0
+        for outer_start, outer_end, inner_start, inner_end, index in spans:
+            literals[-1] += raw[position:inner_start]
+            token = self.tokens[index]
+            if token.replacementType == "static" and token.replacement is not None:
+                literals[-1] += token.replacement
+            else:
+                slots.append(index)
+                originals.append(raw[inner_start:inner_end])
+                literals.append("")
+            position = inner_end
+        literals[-1] += raw[position:]
+        dynamic = set(slots)
+        olds = [(index, old) for index, old in olds if index in dynamic]
+
+        plan = LinePlan(literals, slots, originals, olds)
+        self._lines[raw] = plan
+        return plan
@@ -0,0 +1,138 @@
+import hashlib
+import random
+import re
+from collections import deque
+
+# Characters string(<i>) can produce, the ones urllib's quote() leaves alone
+STRING_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-~/"
+
+_HEX_RE = re.compile(r"hex\((\d+)\)", re.I)
+_STRING_RE = re.compile(r"string\((\d+)\)", re.I)
+
+
+def derive_seed(*keys):
+    """
+    Returns a 64 bit seed derived from keys.  Seeding streams with the configured seed plus a distinct key each gives
+    independent, reproducible streams, the way SeedSequence.spawn() does for NumPy.
+    """
+    digest = hashlib.sha256(repr(keys).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+def _random_bytes(size, rng=random):
+    """Returns size random bytes from rng, so values follow the configured seed"""
+    if size <= 0:
+        return b""
+    return rng.getrandbits(size * 8).to_bytes(size, "little")
+
+
+def ipv4_batch(count, rng=random):
+    data = _random_bytes(count * 4, rng)
+    return ["%d.%d.%d.%d" % tuple(data[i : i + 4]) for i in range(0, count * 4, 4)]
+
+
+def ipv6_batch(count, rng=random):
+    words = memoryview(_random_bytes(count * 16, rng)).cast("H")
+    return [
+        "%x:%x:%x:%x:%x:%x:%x:%x" % tuple(words[i : i + 8])
+        for i in range(0, count * 8, 8)
+    ]
+
+
+def mac_batch(count, rng=random):
+    data = _random_bytes(count * 6, rng)
+    return [
+        "%02x:%02x:%02x:%02x:%02x:%02x" % tuple(data[i : i + 6])
+        for i in range(0, count * 6, 6)
+    ]
+
+
+def hex_batch(count, length, rng=random):
+    if length == 0:
+        return [""] * count
+    width = (length + 1) // 2
+    digits = _random_bytes(count * width, rng).hex().upper()
+    return [digits[i : i + length] for i in range(0, count * width * 2, width * 2)]
+
+
+def string_batch(count, length, rng=random):
+    if length == 0:
+        return [""] * count
+    chars = "".join(rng.choices(STRING_ALPHABET, k=count * length))
+    return [chars[i : i + length] for i in range(0, count * length, length)]
+
+
+def batch_generator(replacement):
+    """
+    Returns a function which takes a count and a random number generator and returns that many random values for a
+    random token replacement, or None if the replacement is not one we can generate in batches.
+    """
+    if replacement is None:
+        return None
+    lowered = replacement.lower()
+    if lowered == "ipv4":
+        return ipv4_batch
+    elif lowered == "ipv6":
+        return ipv6_batch
+    elif lowered == "mac":
+        return mac_batch
+    hexMatch = _HEX_RE.match(replacement)
+    if hexMatch:
+        length = int(hexMatch.group(1))
+        return lambda count, rng=random: hex_batch(count, length, rng)
+    stringMatch = _STRING_RE.match(replacement)
+    if stringMatch:
+        length = int(stringMatch.group(1))
+        return lambda count, rng=random: string_batch(count, length, rng)
+    return None
+
+
+class RandomBuffer(object):
+    """
+    Buffer of pre-generated random values for a single token.  The generator plugin fills it with an interval's worth
+    of values in one call, and token replacement pops one value per event.  deque.popleft() is atomic, so generator
+    threads sharing a token can pull from the same buffer.
+    """
+
+    def __init__(self, generator, batchsize=1024, rng=random):
+        self.generator = generator
+        self.batchsize = batchsize
+        self.rng = rng
+        self._values = deque()
+
+    def __len__(self):
+        return len(self._values)
+
+    def fill(self, count):
+        """Makes sure there are at least count values in the buffer"""
+        missing = count - len(self._values)
+        if missing > 0:
+            self._values.extend(self.generator(missing, self.rng))
+
+    def next(self):
+        try:
+            return self._values.popleft()
+        except IndexError:
+            self._values.extend(self.generator(self.batchsize, self.rng))
+            return self._values.popleft()
+
+
+class RandomStream(random.Random):
+    """
+    Independent random number stream for a single generator run, seeded from the configured seed.  Every run draws
+    from its own stream, so output is reproducible however runs are spread over generator workers.  Buffers of batch
+    generated token values belong to the stream as well, so a run never pulls values generated by another run.
+    """
+
+    def __init__(self, seed):
+        super(RandomStream, self).__init__(seed)
+        self._buffers = {}
+
+    def buffer(self, token, generator):
+        """Returns this stream's buffer of values for token"""
+        try:
+            return self._buffers[id(token)]
+        except KeyError:
+            randomBuffer = RandomBuffer(generator, rng=self)
+            self._buffers[id(token)] = randomBuffer
+            return randomBuffer
@@ -0,0 +1,146 @@
+import datetime
+import glob
+import hashlib
+import os
+from array import array
+
+from splunk_eventgen.lib.eventgenfile import private_directory
+from splunk_eventgen.lib.logging_config import logger
+
+# Base times are saved as microseconds since EPOCH, MISSING_TIME marks events without a timestamp
+EPOCH = datetime.datetime(1970, 1, 1)
+MISSING_TIME = -(2**63)
+
+
+def _cache_path(cacheDir, path, kind, key):
+    """
+    Returns the cache file for kind of parsed data from path, and the glob of every cache file of that kind for
+    path.  The file's size and mtime are part of the key, so a changed file is never served from the cache.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns) + tuple(key)
+    pathHash = hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+    keyHash = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+    pattern = os.path.join(cacheDir, "%s-%s-*.cache" % (pathHash, kind))
+    return (
+        os.path.join(cacheDir, "%s-%s-%s.cache" % (pathHash, kind, keyHash)),
+        pattern,
+    )
+
+
+def samples_dir(sampleCacheDir):
+    """
+    Returns the directory parsed samples are saved in under sampleCacheDir, or None if sampleCacheDir isn't set or
+    the directory isn't private to the current user, so nobody else can plant cached events.
+    """
+    if not sampleCacheDir:
+        return None
+    cacheDir = os.path.join(sampleCacheDir, "samples")
+    return cacheDir if private_directory(cacheDir) else None
+
+
+def _read(sampleCacheDir, path, kind, key):
+    cacheDir = samples_dir(sampleCacheDir)
+    if cacheDir is None:
+        return None
+    try:
+        cachePath, _ = _cache_path(cacheDir, path, kind, key)
+        with open(cachePath, "rb") as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def _write(sampleCacheDir, path, kind, key, chunks):
+    # Write then rename, so other processes never read a partial file, and drop caches of older versions of the file
+    cacheDir = samples_dir(sampleCacheDir)
+    if cacheDir is None:
+        return
+    try:
+        cachePath, pattern = _cache_path(cacheDir, path, kind, key)
+        temp = "%s.%d.tmp" % (cachePath, os.getpid())
+        with open(temp, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(temp, cachePath)
+        for stale in glob.glob(pattern):
+            if stale != cachePath:
+                os.remove(stale)
+    except (IOError, OSError) as e:
+        logger.warning("Could not save parsed sample '%s' to cache: %s" % (path, e))
+
+
+def load_events(path, key, sampleCacheDir=None):
+    """
+    Returns the list of events saved by save_events() for path and key in sampleCacheDir, or None if there are none
+    or sampleCacheDir isn't set
+    """
+    data = _read(sampleCacheDir, path, "events", key)
+    if data is None or len(data) < 8:
+        return None
+    count = int.from_bytes(data[:8], "little")
+    lengths = array("Q")
+    end = 8 + count * lengths.itemsize
+    if len(data) < end:
+        return None
+    lengths.frombytes(data[8:end])
+    if sum(lengths) != len(data) - end:
+        return None
+    events = []
+    position = end
+    for length in lengths:
+        events.append(
+            data[position : position + length].decode("utf-8", "surrogatepass")
+        )
+        position += length
+    return events
+
+
+def save_events(path, key, events, sampleCacheDir=None):
+    """Saves the broken up events of the sample file at path, for the settings in key, if sampleCacheDir is set"""
+    encoded = [event.encode("utf-8", "surrogatepass") for event in events]
+    lengths = array("Q", [len(event) for event in encoded])
+    _write(
+        sampleCacheDir,
+        path,
+        "events",
+        key,
+        [len(encoded).to_bytes(8, "little"), lengths.tobytes(), b"".join(encoded)],
+    )
+
+
+def load_times(path, key, sampleCacheDir=None):
+    """
+    Returns the array of base times saved by save_times() for path and key in sampleCacheDir, or None if there are
+    none or sampleCacheDir isn't set.  Convert them back with to_datetime().
+    """
+    data = _read(sampleCacheDir, path, "times", key)
+    times = array("q")
+    if data is None or len(data) % times.itemsize:
+        return None
+    times.frombytes(data)
+    return times
+
+
+def save_times(path, key, times, sampleCacheDir=None):
+    """Saves the base times of the events in the sample file at path, if sampleCacheDir is set"""
+    _write(sampleCacheDir, path, "times", key, [times.tobytes()])
+
+
+def to_micros(timestamp):
+    """Returns timestamp as microseconds since EPOCH, or MISSING_TIME if it's None"""
+    if timestamp is None:
+        return MISSING_TIME
+    if timestamp.tzinfo is not None:
+        # Only differences between base times matter, so aware timestamps are kept as UTC
+        timestamp = timestamp.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    delta = timestamp - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def to_datetime(micros):
+    """Returns the datetime for microseconds from to_micros(), or None for MISSING_TIME"""
+    if micros == MISSING_TIME:
+        return None
+    return EPOCH + datetime.timedelta(microseconds=micros)
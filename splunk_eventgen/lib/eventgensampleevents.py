@@ -0,0 +1,146 @@
+from collections.abc import Sequence
+from itertools import repeat
+
+
+class SampleEvents(Sequence):
+    """
+    Events of a raw sample, kept as a list of _raw strings and one dict of the fields every event shares (index,
+    host, source and sourcetype), instead of one dict per event carrying copies of the same fields.  Stands in for a
+    sample's sampleDict list: indexing or slicing it returns the event dicts loadSample() used to build, and
+    generators that know about it use take() and iter_raws() so no per-event dict is ever made.
+    """
+
+    def __init__(self, raws, fields):
+        self.raws = raws
+        self.fields = fields
+
+    def __len__(self):
+        return len(self.raws)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.event(i) for i in range(*index.indices(len(self)))]
+        return self.event(index)
+
+    def __iter__(self):
+        for raw in self.iter_raws():
+            event = dict(self.fields)
+            event["_raw"] = raw
+            yield event
+
+    def raw(self, index):
+        """Returns the text of event number index"""
+        return self.raws[index]
+
+    def iter_raws(self):
+        """Returns an iterator over the text of every event"""
+        return iter(self.raws)
+
+    def event(self, index):
+        event = dict(self.fields)
+        event["_raw"] = self.raw(index)
+        return event
+
+    def column(self, name):
+        """Returns an iterator over the value of field name of every event"""
+        if name == "_raw":
+            return self.iter_raws()
+        return repeat(self.fields[name], len(self))
+
+    def take(self, indexes):
+        """Returns the events at indexes, in order, sharing this sample's fields"""
+        raw = self.raw
+        return SampleEvents([raw(i) for i in indexes], self.fields)
+
+    def average_size(self):
+        """Returns the average size of an event"""
+        if not len(self):
+            return 0
+        return sum(len(raw) for raw in self.raws) / len(self)
+
+
+class SampleColumns(SampleEvents):
+    """
+    Events of a CSV sample, kept as one list per column instead of one dict per row.  raws is the _raw column,
+    columns has every other column of the CSV in file order, and fields has the values of index, host, hostRegex,
+    source and sourcetype for the ones the CSV doesn't have.  Repeated values of those columns are stored once.
+    """
+
+    # Columns which mostly repeat the same few values
+    metadataColumns = ("index", "host", "hostRegex", "source", "sourcetype")
+
+    def __init__(self, raws, columns, fields, header=None):
+        super(SampleColumns, self).__init__(raws, fields)
+        self.columns = columns
+        # Order of the columns in the CSV, so rows come out as csv.DictReader() would have read them
+        self.header = header or ["_raw"] + list(columns)
+
+    @classmethod
+    def from_rows(cls, header, rows, fields):
+        """
+        Builds the columns from the header and rows of a csv.reader() over a CSV with a _raw column.  Short rows are
+        padded with None and extra values are dropped, and the last of repeated column names wins, like
+        csv.DictReader() does.  Every _raw value is made to end in a newline.
+        """
+        positions = dict((name, position) for position, name in enumerate(header))
+        header = [
+            name for position, name in enumerate(header) if positions[name] == position
+        ]
+        rawPosition = positions["_raw"]
+        raws = []
+        columns = {}
+        readers = []
+        for name in header:
+            if name == "_raw":
+                continue
+            columns[name] = []
+            intern = {}.setdefault if name in cls.metadataColumns else None
+            readers.append((positions[name], columns[name].append, intern))
+        width = len(positions) and max(positions.values()) + 1
+        for row in rows:
+            if not row:
+                # Blank lines aren't rows
+                continue
+            if len(row) < width:
+                row = row + [None] * (width - len(row))
+            raw = row[rawPosition] or ""
+            if raw[-1:] != "\n":
+                raw += "\n"
+            raws.append(raw)
+            for position, append, intern in readers:
+                value = row[position]
+                append(value if intern is None else intern(value, value))
+        fields = dict(
+            (name, value) for name, value in fields.items() if name not in positions
+        )
+        return cls(raws, columns, fields, header)
+
+    def event(self, index):
+        event = {}
+        for name in self.header:
+            event[name] = (
+                self.raws[index] if name == "_raw" else self.columns[name][index]
+            )
+        event.update(self.fields)
+        return event
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.event(i)
+
+    def column(self, name):
+        if name in self.columns:
+            return iter(self.columns[name])
+        return super(SampleColumns, self).column(name)
+
+    def take(self, indexes):
+        indexes = list(indexes)
+        return SampleColumns(
+            [self.raws[i] for i in indexes],
+            dict(
+                (name, [column[i] for i in indexes])
+                for name, column in self.columns.items()
+            ),
+            self.fields,
+            self.header,
+        )
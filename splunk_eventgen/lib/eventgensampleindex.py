@@ -0,0 +1,217 @@
+import glob
+import hashlib
+import mmap
+import os
+import re
+import threading
+from array import array
+
+from splunk_eventgen.lib.eventgenfile import private_directory
+from splunk_eventgen.lib.eventgensampleevents import SampleEvents
+from splunk_eventgen.lib.logging_config import logger
+
+_NEWLINE_RE = re.compile(b"\n")
+
+# Mapped sample files and their event offsets, shared by every SampleIndex of this process
+_indexes = {}
+_indexesLock = threading.Lock()
+
+
+def _line_offsets(data):
+    """Returns the start and end offsets of every line in data, leaving out empty lines"""
+    starts = array("Q")
+    ends = array("Q")
+    start = 0
+    for match in _NEWLINE_RE.finditer(data):
+        end = match.end()
+        # "\n" and "\r\n" are empty lines
+        if end - start > 2 or (end - start == 2 and data[start] != 13):
+            starts.append(start)
+            ends.append(end)
+        start = end
+    if start < len(data):
+        starts.append(start)
+        ends.append(len(data))
+    return starts, ends
+
+
+def breaker_bounds(data, breakerRE):
+    """
+    Returns the offset every event in data starts at, followed by len(data), breaking data before every match of
+    breakerRE.  A match at the very start of data doesn't start a new event.  Matches are found in a single finditer()
+    pass, so this works as well on a memory mapped file with a bytes pattern as it does on a string.
+    """
+    bounds = [0]
+    bounds.extend(m.start() for m in breakerRE.finditer(data) if m.start() != 0)
+    bounds.append(len(data))
+    return bounds
+
+
+def _breaker_offsets(data, breaker):
+    """
+    Returns the start and end offsets of every event in data, broken before every match of breaker the same way
+    Sample.processSampleLine() does it.  Events which are empty or only a newline are left out.
+    """
+    bounds = breaker_bounds(data, re.compile(breaker.encode("utf-8"), re.M))
+    starts = array("Q")
+    ends = array("Q")
+    for start, end in zip(bounds, bounds[1:]):
+        if end <= start or data[start:end] in (b"\n", b"\r\n"):
+            continue
+        starts.append(start)
+        ends.append(end)
+    return starts, ends
+
+
+def index_dir(sampleCacheDir):
+    """
+    Returns the directory the event offsets of streamed samples are saved in under sampleCacheDir, or None if
+    sampleCacheDir isn't set or the directory isn't private to the current user
+    """
+    if not sampleCacheDir:
+        return None
+    indexDir = os.path.join(sampleCacheDir, "index")
+    return indexDir if private_directory(indexDir) else None
+
+
+def _index_path(indexDir, path, key):
+    pathHash = hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+    keyHash = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(indexDir, "%s-%s.idx" % (pathHash, keyHash)), pathHash
+
+
+def _load_offsets(indexPath):
+    try:
+        size = os.path.getsize(indexPath)
+        if size % 16:
+            return None
+        starts = array("Q")
+        ends = array("Q")
+        with open(indexPath, "rb") as f:
+            starts.fromfile(f, size // 16)
+            ends.fromfile(f, size // 16)
+        return starts, ends
+    except (IOError, OSError, EOFError):
+        return None
+
+
+def _save_offsets(indexPath, pathHash, starts, ends):
+    # Write then rename, so other processes never read a partial index, and drop indexes of older versions of the file
+    temp = "%s.%d.tmp" % (indexPath, os.getpid())
+    indexDir = os.path.dirname(indexPath)
+    try:
+        with open(temp, "wb") as f:
+            starts.tofile(f)
+            ends.tofile(f)
+        os.replace(temp, indexPath)
+        for stale in glob.glob(os.path.join(indexDir, "%s-*.idx" % pathHash)):
+            if stale != indexPath:
+                os.remove(stale)
+    except (IOError, OSError) as e:
+        logger.warning("Could not save sample index '%s': %s" % (indexPath, e))
+
+
+def _open(path, breaker, sampleCacheDir=None):
+    """
+    Returns the mapped file and event offsets of path, from this process, the index saved in sampleCacheDir or by
+    indexing it
+    """
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns, breaker)
+    try:
+        return _indexes[key]
+    except KeyError:
+        pass
+    with _indexesLock:
+        if key in _indexes:
+            return _indexes[key]
+        if stat.st_size == 0:
+            data = b""
+        else:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        indexDir = index_dir(sampleCacheDir)
+        offsets = None
+        if indexDir is not None:
+            indexPath, pathHash = _index_path(indexDir, path, key)
+            offsets = _load_offsets(indexPath)
+        if offsets is None:
+            logger.debug("Indexing sample file %s" % path)
+            if breaker is None:
+                offsets = _line_offsets(data)
+            else:
+                offsets = _breaker_offsets(data, breaker)
+            if indexDir is not None:
+                _save_offsets(indexPath, pathHash, *offsets)
+        else:
+            logger.debug("Loaded sample index %s for %s" % (indexPath, path))
+        _indexes[key] = (data, offsets[0], offsets[1])
+        return _indexes[key]
+
+
+def clear_sample_indexes():
+    """Forgets every mapped sample file, so changed files are indexed again the next time they are used"""
+    with _indexesLock:
+        _indexes.clear()
+
+
+class SampleIndex(SampleEvents):
+    """
+    Events of a raw sample, read from the memory mapped sample file when they are used.  Only the start and end offset
+    of every event is kept in memory, and with sampleCacheDir set the offsets are saved under it, so a sample file is
+    only scanned for events once.  Otherwise it's used like the SampleEvents loadSample() builds for samples held in
+    memory.
+
+    breaker is None to break events on lines, or a regular expression to break them before every match.  Pickled
+    copies only carry the path, breaker, fields and sampleCacheDir, and map the file again in the process they are
+    unpickled in.
+    """
+
+    def __init__(self, path, breaker=None, fields=None, sampleCacheDir=None):
+        self.path = os.path.abspath(path)
+        self.breaker = breaker
+        self.fields = dict(fields or {})
+        self.sampleCacheDir = sampleCacheDir
+        self._data, self._starts, self._ends = _open(self.path, breaker, sampleCacheDir)
+
+    def __getstate__(self):
+        return {
+            "path": self.path,
+            "breaker": self.breaker,
+            "fields": self.fields,
+            "sampleCacheDir": self.sampleCacheDir,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(
+            state["path"],
+            state["breaker"],
+            state["fields"],
+            state.get("sampleCacheDir"),
+        )
+
+    def __len__(self):
+        return len(self._starts)
+
+    def raw(self, index):
+        """Returns the text of event number index, ending with a newline"""
+        chunk = self._data[self._starts[index] : self._ends[index]]
+        try:
+            text = chunk.decode("utf-8")
+        except UnicodeDecodeError:
+            text = chunk.decode("latin-1")
+        if "\r" in text:
+            # Universal newlines, like reading the sample in text mode
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        if text[-1] != "\n":
+            text += "\n"
+        return text
+
+    def iter_raws(self):
+        return (self.raw(i) for i in range(len(self)))
+
+    def average_size(self):
+        """Returns the average size of an event in bytes, without reading any of them"""
+        if not self._starts:
+            return 0
+        return (sum(self._ends) - sum(self._starts)) / len(self._starts)
@@ -1,6 +1,7 @@
 # TODO Move config settings to plugins
 import csv
 import datetime
+import io
 import os
 import pprint
 import re
@@ -10,6 +11,12 @@ import six.moves.urllib.error
 import six.moves.urllib.parse
 import six.moves.urllib.request
 
+from splunk_eventgen.lib.eventgenplan import ReplacementPlan
+from splunk_eventgen.lib.eventgenrandom import derive_seed
+from splunk_eventgen.lib.eventgensamplecache import load_events, save_events
+from splunk_eventgen.lib.eventgensampleevents import SampleColumns, SampleEvents
+from splunk_eventgen.lib.eventgensampleindex import SampleIndex, breaker_bounds
+from splunk_eventgen.lib.eventgentimeformat import strptime
 from splunk_eventgen.lib.logging_config import logger
 from splunk_eventgen.lib.timeparser import timeParser
 
@@ -86,7 +93,11 @@ class Sample(object):
     end = None
     queueable = None
     autotimestamp = None
+    seed = None
     extendIndexes = None
+    streamSample = None
+    stateDir = None
+    sampleCacheDir = None
 
     # Internal fields
     sampleLines = None
@@ -98,6 +109,10 @@ class Sample(object):
     _lastts = None
     _earliestParsed = None
     _latestParsed = None
+    _replacementPlan = None
+    _randomStreams = 0
+    _baseTimes = None
+    _timestampTokens = None
 
     def __init__(self, name):
         self.name = name
@@ -111,7 +126,13 @@ class Sample(object):
 
     def __str__(self):
         """Only used for debugging, outputs a pretty printed representation of this sample"""
-        filter_list = ["sampleLines", "sampleDict"]
+        filter_list = [
+            "sampleLines",
+            "sampleDict",
+            "_replacementPlan",
+            "_baseTimes",
+            "_timestampTokens",
+        ]
         temp = dict(
             [
                 (key, value)
@@ -172,8 +193,11 @@ class Sample(object):
         if passed_token is not None:
             tokens = [passed_token]
         else:
-            tokens = self.tokens
-        for token in tokens:
+            # Events of a sample nearly always match the same token, so try the one that matched last first
+            tokens = self._timestampTokens
+            if tokens is None or len(tokens) != len(self.tokens):
+                tokens = self._timestampTokens = list(self.tokens)
+        for position, token in enumerate(tokens):
             try:
                 formats.append(token.token)
                 # logger.debug("Searching for token '%s' in event '%s'" % (token.token, event))
@@ -194,23 +218,19 @@ class Sample(object):
                     else:
                         # logger.debug("Getting time for timeFormat '%s' and timeString '%s'" %
                         #                   (timeFormat, timeString))
-                        # Working around Python bug with a non thread-safe strptime. Randomly get AttributeError
-                        # when calling strptime, so if we get that, try again
-                        while currentTime is None:
-                            try:
-                                # Checking for timezone adjustment
-                                if timeString[-5] == "+":
-                                    timeString = timeString[:-5]
-                                currentTime = datetime.datetime.strptime(
-                                    timeString, timeFormat
-                                )
-                            except AttributeError:
-                                pass
+                        # Checking for timezone adjustment
+                        if timeString[-5] == "+":
+                            timeString = timeString[:-5]
+                        currentTime = strptime(timeString, timeFormat)
                     logger.debug(
                         "Match '%s' Format '%s' result: '%s'"
                         % (timeString, timeFormat, currentTime)
                     )
                     if type(currentTime) == datetime.datetime:
+                        if position and passed_token is None:
+                            self._timestampTokens = [token] + [
+                                t for t in tokens if t is not token
+                            ]
                         break
             except ValueError:
                 logger.warning(
@@ -240,19 +260,98 @@ class Sample(object):
         #     self.timestamp = currentTime
         return currentTime
 
+    def getLegacyStateFile(self, token):
+        """Returns the path of the file earlier versions saved the state of an integerid token in"""
+        return os.path.join(
+            self.sampleDir,
+            "state." + six.moves.urllib.request.pathname2url(token.token),
+        )
+
+    def getStateFile(self, token):
+        """Returns the path of the file holding the state of an integerid token, or None if stateDir is not set"""
+        if not self.stateDir:
+            return None
+        return os.path.join(
+            self.stateDir,
+            "%s.state.%s"
+            % (
+                six.moves.urllib.parse.quote(self.name, safe=""),
+                six.moves.urllib.parse.quote(token.token, safe=""),
+            ),
+        )
+
+    def getSettingsSignature(self):
+        """
+        Returns everything this sample was configured with: its settings, its tokens and the size and modification time
+        of its sample file.  A sample parsed again from an unchanged stanza and sample file has the same signature.
+        """
+        # Compared as text, the first parse of a config runs before plugins register their int settings
+        settings = [
+            (name, str(getattr(self, name, None)))
+            for name in dict.fromkeys(self.config._validSettings)
+        ]
+        tokens = []
+        for token in self.tokens + [self.hostToken]:
+            if token is not None:
+                # integerid tokens start from their state file, which moves on while the sample runs
+                replacement = (
+                    None if token.replacementType == "integerid" else token.replacement
+                )
+                tokens.append((token.token, token.replacementType, replacement))
+        try:
+            stat = os.stat(self.filePath)
+            sampleFile = (stat.st_size, stat.st_mtime_ns)
+        except (TypeError, OSError):
+            sampleFile = None
+        return (tuple(settings), tuple(tokens), sampleFile)
+
+    def nextRandomSeed(self):
+        """
+        Returns the seed of the random stream for this sample's next generator run, or None if no seed is configured.
+        Raters create runs in order from the sample's timer, so the nth run always gets the same stream.
+        """
+        if self.seed is None:
+            return None
+        self._randomStreams += 1
+        return derive_seed(self.seed, self.name, self._randomStreams)
+
+    def getTokenRateFactor(self, now=None):
+        """
+        Returns the factor rated tokens are multiplied by at now, the product of this sample's hourOfDayRate and
+        dayOfWeekRate.  Generators resolve it once per interval and pass it to every token.
+        """
+        if now is None:
+            now = self.now()
+        rateFactor = 1.0
+        if type(self.hourOfDayRate) == dict:
+            try:
+                rateFactor *= self.hourOfDayRate[str(now.hour)]
+            except KeyError:
+                logger.error(
+                    "Hour of day rate for hour %s missing for rated tokens in sample '%s'"
+                    % (now.hour, self.name)
+                )
+        if type(self.dayOfWeekRate) == dict:
+            # dayOfWeekRate starts the week on Sunday
+            weekday = (datetime.date.weekday(now) + 1) % 7
+            try:
+                rateFactor *= self.dayOfWeekRate[str(weekday)]
+            except KeyError:
+                logger.error(
+                    "Day of week rate for day %s missing for rated tokens in sample '%s'"
+                    % (weekday, self.name)
+                )
+        return rateFactor
+
     def saveState(self):
-        """Saves state of all integer IDs of this sample to a file so when we restart we'll pick them up"""
+        """Saves state of all integer IDs of this sample to stateDir so when we restart we'll pick them up"""
         for token in self.tokens:
             if token.replacementType == "integerid":
-                stateFile = open(
-                    os.path.join(
-                        self.sampleDir,
-                        "state." + six.moves.urllib.request.pathname2url(token.token),
-                    ),
-                    "w",
-                )
-                stateFile.write(token.replacement)
-                stateFile.close()
+                stateFile = self.getStateFile(token)
+                counter = token.get_counter()
+                if stateFile and counter is not None:
+                    counter.stateFile = stateFile
+                    counter.save()
 
     def now(self, utcnow=False, realnow=False):
         # logger.info("Getting time (timezone %s)" % (self.timezone))
@@ -398,103 +497,151 @@ class Sample(object):
                     self.app,
                 )
                 self.breaker = self.config.breaker
+                return io.StringIO(sampleData, newline="\n").readlines()
 
-            # Loop through data, finding matches of the regular expression and breaking them up into
-            # "lines".  Each match includes the breaker itself.
-            extractpos = 0
-            searchpos = 0
-            breakerMatch = breakerRE.search(sampleData, searchpos)
-            while breakerMatch:
-                logger.debug(
-                    "Breaker found at: %d, %d"
-                    % (breakerMatch.span()[0], breakerMatch.span()[1])
-                )
-                # Ignore matches at the beginning of the file
-                if breakerMatch.span()[0] != 0:
-                    sampleLines.append(sampleData[extractpos : breakerMatch.span()[0]])
-                    extractpos = breakerMatch.span()[0]
-                searchpos = breakerMatch.span()[1]
-                breakerMatch = breakerRE.search(sampleData, searchpos)
-            sampleLines.append(sampleData[extractpos:])
+            # Break the data up into "lines" before every match of the regular expression, finding every match in
+            # one pass.  Each match starts the line it breaks.
+            bounds = breaker_bounds(sampleData, breakerRE)
+            sampleLines = [
+                sampleData[start:end] for start, end in zip(bounds, bounds[1:])
+            ]
+            logger.debug(
+                "Found %d breakers in sample '%s' in app '%s'"
+                % (len(sampleLines) - 1, self.name, self.app)
+            )
         return sampleLines
 
+    def loadSampleIndex(self):
+        """
+        Index the events of a raw sample into self.sampleDict without reading them into memory, for streamSample
+        """
+        breaker = None
+        if self.breaker != self.config.breaker:
+            try:
+                re.compile(self.breaker.encode("utf-8"), re.M)
+                breaker = self.breaker
+            except:
+                logger.error(
+                    "Line breaker '%s' for sample '%s' in app '%s'"
+                    " could not be compiled; using default breaker",
+                    self.breaker,
+                    self.name,
+                    self.app,
+                )
+                self.breaker = self.config.breaker
+        self.sampleDict = SampleIndex(
+            self.filePath,
+            breaker,
+            {
+                "index": self.index,
+                "host": self.host,
+                "source": self.source,
+                "sourcetype": self.sourcetype,
+            },
+            self.sampleCacheDir,
+        )
+        logger.debug(
+            "Finished indexing sample '%s'.  Len sampleDict: %d"
+            % (self.name, len(self.sampleDict))
+        )
+        # Lines are compiled into the plan as they're used, and only so many are kept
+        self._replacementPlan = ReplacementPlan(
+            self.tokens, cacheSize=ReplacementPlan.streamCacheSize, sample=self
+        )
+
     def loadSample(self):
         """
         Load sample from disk into self._sample.sampleLines and self._sample.sampleDict, using cached copy if possible
         """
         if self.sampletype == "raw":
             # 5/27/12 CS Added caching of the sample file
-            if self.sampleDict is None:
-                self.sampleLines = []
-                try:
-                    with open(self.filePath, "r") as fh:
-                        self.sampleLines = self.processSampleLine(fh)
-                except UnicodeDecodeError:
-                    # incase you can't read it in the default encoding, change over to latin-1
-                    with open(self.filePath, "r", encoding="latin-1") as fh:
-                        self.sampleLines = self.processSampleLine(fh)
-                self.sampleDict = []
-                for line in self.sampleLines:
-                    if line == "\n":
-                        continue
-                    if line and line[-1] != "\n":
-                        line = line + "\n"
-                    self.sampleDict.append(
-                        {
-                            "_raw": line,
-                            "index": self.index,
-                            "host": self.host,
-                            "source": self.source,
-                            "sourcetype": self.sourcetype,
-                        }
+            if self.sampleDict is None and self.streamSample:
+                self.loadSampleIndex()
+            elif self.sampleDict is None:
+                # Samples broken up by an earlier run, reload or worker process are read from the cache
+                raws = load_events(
+                    self.filePath, ("raw", self.breaker), self.sampleCacheDir
+                )
+                if raws is not None:
+                    logger.debug(
+                        "Read raw sample '%s' in app '%s' from cache"
+                        % (self.name, self.app)
                     )
+                    self.sampleLines = raws
+                else:
+                    cacheKey = ("raw", self.breaker)
+                    self.sampleLines = []
+                    try:
+                        with open(self.filePath, "r") as fh:
+                            self.sampleLines = self.processSampleLine(fh)
+                    except UnicodeDecodeError:
+                        # incase you can't read it in the default encoding, change over to latin-1
+                        with open(self.filePath, "r", encoding="latin-1") as fh:
+                            self.sampleLines = self.processSampleLine(fh)
+                    raws = []
+                    for line in self.sampleLines:
+                        if line == "\n":
+                            continue
+                        if line and line[-1] != "\n":
+                            line = line + "\n"
+                        raws.append(line)
+                    save_events(self.filePath, cacheKey, raws, self.sampleCacheDir)
+                    self.sampleLines = raws
+                # Every event shares one dict of fields instead of carrying its own copies, and sampleDict
+                # shares the list of lines with sampleLines, so each line is only kept once
+                self.sampleDict = SampleEvents(
+                    raws,
+                    {
+                        "index": self.index,
+                        "host": self.host,
+                        "source": self.source,
+                        "sourcetype": self.sourcetype,
+                    },
+                )
                 logger.debug(
                     "Finished creating sampleDict & sampleLines.  Len samplesLines: %d Len sampleDict: %d"
                     % (len(self.sampleLines), len(self.sampleDict))
                 )
+                self._replacementPlan = ReplacementPlan(self.tokens, raws, sample=self)
         elif self.sampletype == "csv":
             if self.sampleDict is None:
                 with open(self.filePath, "r") as fh:
                     logger.debug(
                         "Reading csv sample '%s' in app '%s'" % (self.name, self.app)
                     )
-                    self.sampleDict = []
-                    self.sampleLines = []
                     # Fix to load large csv files, work with python 2.5 onwards
                     csv.field_size_limit(sys.maxsize)
-                    csvReader = csv.DictReader(fh)
-                    for line in csvReader:
-                        if "_raw" in line:
-                            # Use conf-defined values for these params instead of sample-defined ones
-                            current_line_keys = list(line.keys())
-                            if "host" not in current_line_keys:
-                                line["host"] = self.host
-                            if "hostRegex" not in current_line_keys:
-                                line["hostRegex"] = self.hostRegex
-                            if "source" not in current_line_keys:
-                                line["source"] = self.source
-                            if "sourcetype" not in current_line_keys:
-                                line["sourcetype"] = self.sourcetype
-                            if "index" not in current_line_keys:
-                                line["index"] = self.index
-                            self.sampleDict.append(line)
-                            self.sampleLines.append(line["_raw"])
-                        else:
-                            logger.error(
-                                "Missing _raw in line '%s'" % pprint.pformat(line)
-                            )
+                    csvReader = csv.reader(fh)
+                    header = next(csvReader, [])
+                    # Use conf-defined values for these params instead of sample-defined ones
+                    fields = {
+                        "host": self.host,
+                        "hostRegex": self.hostRegex,
+                        "source": self.source,
+                        "sourcetype": self.sourcetype,
+                        "index": self.index,
+                    }
+                    if "_raw" in header:
+                        self.sampleDict = SampleColumns.from_rows(
+                            header, csvReader, fields
+                        )
+                    else:
+                        rows = sum(1 for row in csvReader)
+                        logger.error(
+                            "Missing _raw in csv sample '%s' in app '%s', ignoring its %d lines"
+                            % (self.name, self.app, rows)
+                        )
+                        self.sampleDict = SampleColumns([], {}, fields)
+                    self.sampleLines = None
 
                 logger.debug(
-                    "Finished creating sampleDict & sampleLines for sample '%s'.  Len sampleDict: %d"
+                    "Finished creating sampleDict for sample '%s'.  Len sampleDict: %d"
                     % (self.name, len(self.sampleDict))
                 )
 
-                for i in range(0, len(self.sampleDict)):
-                    if (
-                        len(self.sampleDict[i]["_raw"]) < 1
-                        or self.sampleDict[i]["_raw"][-1] != "\n"
-                    ):
-                        self.sampleDict[i]["_raw"] += "\n"
+                self._replacementPlan = ReplacementPlan(
+                    self.tokens, self.sampleDict.raws, sample=self
+                )
         if self.extendIndexes:
             try:
                 for index_item in self.extendIndexes.split(","):
@@ -521,8 +668,29 @@ class Sample(object):
                 # only read the extendIndexes configure once.
                 self.extendIndexes = None
 
+    def get_replacement_plan(self):
+        """
+        Returns the token replacement plan for this sample.  The plan is built when the sample is loaded, but tokens
+        can still be added afterwards (autotimestamp), so rebuild it if it was built for a different list of tokens.
+        """
+        plan = self._replacementPlan
+        if plan is None or not plan.matches(self.tokens):
+            if isinstance(self.sampleDict, SampleIndex):
+                plan = ReplacementPlan(
+                    self.tokens, cacheSize=ReplacementPlan.streamCacheSize, sample=self
+                )
+            elif isinstance(self.sampleDict, SampleEvents):
+                plan = ReplacementPlan(self.tokens, self.sampleDict.raws, sample=self)
+            else:
+                lines = (
+                    [e["_raw"] for e in self.sampleDict] if self.sampleDict else None
+                )
+                plan = ReplacementPlan(self.tokens, lines, sample=self)
+            self._replacementPlan = plan
+        return plan
+
     def get_loaded_sample(self):
-        if self.sampletype == "csv":
+        if self.sampletype == "csv" or self.streamSample:
             self.loadSample()
             return self.sampleDict
         else:
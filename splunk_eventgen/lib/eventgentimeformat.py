@@ -0,0 +1,148 @@
+import _strptime  # noqa: F401 Imported up front, strptime() importing it in a thread isn't thread safe
+import datetime
+from operator import attrgetter
+
+# Fixed width directives, with the position of the datetime() argument they hold and their width
+_FIELDS = {
+    "Y": (0, 4),
+    "y": (0, 2),
+    "m": (1, 2),
+    "d": (2, 2),
+    "H": (3, 2),
+    "M": (4, 2),
+    "S": (5, 2),
+    "f": (6, 6),
+}
+_NAMES = ("year", "month", "day", "hour", "minute", "second", "microsecond")
+# What strptime() fills in for fields the format doesn't have
+_DEFAULTS = (1900, 1, 1, 0, 0, 0, 0)
+
+# Compiled formats, keyed by format string
+_formats = {}
+# Formats kept before the cache is started over
+FORMAT_CACHE_SIZE = 1024
+
+
+class TimeFormat(object):
+    """
+    A strptime()/strftime() format compiled into the position of every field, for formats only made of fixed width
+    numeric directives (%Y %y %m %d %H %M %S %f) and literal text.  parse() slices the fields out of a timestamp and
+    format() fills them into a % template.  Anything the compiled format can't handle, like other directives, single
+    digit fields or a year before 1000, goes to datetime's strptime() or strftime(), so results are always the same.
+    """
+
+    def __init__(self, fmt):
+        self.fmt = fmt
+        # (start, end, directive) of every field and (start, end, text) of every run of literal text, or None when
+        # fmt isn't supported
+        self.fields = []
+        self.literals = []
+        template = []
+        position = 0
+        i = 0
+        while i < len(fmt):
+            if fmt[i] == "%":
+                directive = fmt[i + 1 : i + 2]
+                i += 2
+                if directive == "%":
+                    self._add_literal(position, "%")
+                    template.append("%%")
+                    position += 1
+                    continue
+                if directive not in _FIELDS:
+                    self.fields = None
+                    break
+                width = _FIELDS[directive][1]
+                self.fields.append((position, position + width, directive))
+                template.append("%%0%dd" % width)
+                position += width
+            else:
+                self._add_literal(position, fmt[i])
+                template.append(fmt[i])
+                position += 1
+                i += 1
+        if self.fields is not None:
+            slots = [_FIELDS[directive][0] for _, _, directive in self.fields]
+            if len(set(slots)) != len(slots):
+                # strptime() refuses repeated fields, leave the error to it
+                self.fields = None
+        if self.fields is None:
+            self.literals = None
+            return
+        self.length = position
+        self.template = "".join(template)
+        self._slots = [
+            (start, end, _FIELDS[directive][0]) for start, end, directive in self.fields
+        ]
+        # Position of %y in the fields, which holds the year without its century
+        self._shortYear = next(
+            (i for i, (_, _, directive) in enumerate(self.fields) if directive == "y"),
+            None,
+        )
+        names = [_NAMES[slot] for slot in slots]
+        if len(names) > 1:
+            self._values = attrgetter(*names)
+        elif names:
+            name = names[0]
+            self._values = lambda timestamp: (getattr(timestamp, name),)
+        else:
+            self._values = lambda timestamp: ()
+
+    def _add_literal(self, position, char):
+        if self.literals and self.literals[-1][1] == position:
+            start, _, text = self.literals[-1]
+            self.literals[-1] = (start, position + 1, text + char)
+        else:
+            self.literals.append((position, position + 1, char))
+
+    def parse(self, string):
+        """Returns the datetime in string, like datetime.datetime.strptime(string, fmt) would"""
+        if self.fields is None or len(string) != self.length or not string.isascii():
+            return datetime.datetime.strptime(string, self.fmt)
+        for start, end, text in self.literals:
+            if string[start:end] != text:
+                return datetime.datetime.strptime(string, self.fmt)
+        values = list(_DEFAULTS)
+        for start, end, slot in self._slots:
+            value = string[start:end]
+            if not value.isdigit():
+                return datetime.datetime.strptime(string, self.fmt)
+            values[slot] = int(value)
+        if self._shortYear is not None:
+            values[0] += 2000 if values[0] <= 68 else 1900
+        try:
+            return datetime.datetime(*values)
+        except ValueError:
+            return datetime.datetime.strptime(string, self.fmt)
+
+    def format(self, timestamp):
+        """Returns timestamp formatted like timestamp.strftime(fmt) would"""
+        if self.fields is None or timestamp.year < 1000:
+            return timestamp.strftime(self.fmt)
+        values = self._values(timestamp)
+        if self._shortYear is not None:
+            values = list(values)
+            values[self._shortYear] %= 100
+            values = tuple(values)
+        return self.template % values
+
+
+def compile_time_format(fmt):
+    """Returns the TimeFormat for fmt, compiling it the first time it's used"""
+    try:
+        return _formats[fmt]
+    except KeyError:
+        if len(_formats) >= FORMAT_CACHE_SIZE:
+            _formats.clear()
+        compiled = _formats[fmt] = TimeFormat(fmt)
+        return compiled
+
+
+def strptime(string, fmt):
+    """Drop in for datetime.datetime.strptime()"""
+    return compile_time_format(fmt).parse(string)
+
+
+def strftime(timestamp, fmt):
+    """Drop in for timestamp.strftime(fmt)"""
+    return compile_time_format(fmt).format(timestamp)
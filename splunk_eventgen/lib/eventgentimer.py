@@ -1,6 +1,7 @@
 import datetime
 import time
 
+from splunk_eventgen.lib.eventgensampleevents import SampleEvents
 from splunk_eventgen.lib.logging_config import logger
 
 
@@ -33,6 +34,7 @@ class Timer(object):
         genqueue=None,
         outputqueue=None,
         loggingqueue=None,
+        manager=None,
     ):
         # Logger already setup by config, just get an instance
         # setup default options
@@ -42,6 +44,7 @@ class Timer(object):
         self.end = getattr(self.sample, "end", -1)
         self.endts = getattr(self.sample, "endts", None)
         self.generatorQueue = genqueue
+        self.manager = manager
         self.outputQueue = outputqueue
         self.time = time
         self.stopping = False
@@ -92,6 +95,9 @@ class Timer(object):
         except TypeError:
             logger.debug("Error loading sample file for sample '%s'" % self.sample.name)
             return
+        if isinstance(self.sample.sampleDict, SampleEvents):
+            # Streamed samples are sized without reading them
+            return self.sample.sampleDict.average_size()
         total_len = sum([len(e["_raw"]) for e in self.sample.sampleDict])
         sample_count = len(self.sample.sampleDict)
         if sample_count == 0:
@@ -151,6 +157,7 @@ class Timer(object):
                     config=self.config,
                     sample=self.sample,
                     generatorQueue=self.generatorQueue,
+                    manager=self.manager,
                     outputQueue=self.outputQueue,
                     outputPlugin=self.outputPlugin,
                     generatorPlugin=self.generatorPlugin,
@@ -163,6 +170,7 @@ class Timer(object):
                             config=self.config,
                             sample=self.sample,
                             generatorQueue=self.generatorQueue,
+                            manager=self.manager,
                             outputQueue=self.outputQueue,
                             outputPlugin=self.outputPlugin,
                             generatorPlugin=self.generatorPlugin,
@@ -175,6 +183,7 @@ class Timer(object):
                                 config=self.config,
                                 sample=self.sample,
                                 generatorQueue=self.generatorQueue,
+                                manager=self.manager,
                                 outputQueue=self.outputQueue,
                                 outputPlugin=self.outputPlugin,
                                 generatorPlugin=self.generatorPlugin,
@@ -224,3 +233,6 @@ class Timer(object):
 
             time.sleep(self.time)
             self.countdown -= self.time
+        # Save where the integerid counters of this sample stopped, for the next run
+        if self.sample.stateDir:
+            self.sample.saveState()
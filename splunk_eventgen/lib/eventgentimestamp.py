@@ -1,11 +1,51 @@
 import datetime
 import random
+import threading
 import time
 
+from splunk_eventgen.lib.eventgentimeformat import strftime
+
+# Formatted timestamps per thread, keyed by (format, timestamp truncated to the second)
+_formatCache = threading.local()
+# Entries kept per thread before the cache is started over
+FORMAT_CACHE_SIZE = 4096
+
 
 class EventgenTimestamp(object):
     @staticmethod
-    def get_random_timestamp(earliest, latest):
+    def format_timestamp(timestamp, fmt):
+        """
+        Formats timestamp with the strftime format fmt, where %s is the epoch second.  The second level part of the
+        result is cached per thread and shared by every token using the same format, so events landing in the same
+        second only pay for one mktime and strftime.  %f is filled in from the timestamp's microseconds on every call.
+        """
+        try:
+            cache = _formatCache.entries
+        except AttributeError:
+            cache = _formatCache.entries = {}
+        if "%f" in fmt and "%%" in fmt:
+            # Can't tell a literal %f from a directive by splitting, don't share across microseconds
+            second = timestamp
+        else:
+            second = timestamp.replace(microsecond=0)
+        key = (fmt, second)
+        try:
+            parts = cache[key]
+        except KeyError:
+            if len(cache) >= FORMAT_CACHE_SIZE:
+                cache.clear()
+            fmt = fmt.replace("%s", str(int(time.mktime(second.timetuple()))))
+            if second is timestamp:
+                parts = (strftime(timestamp, fmt),)
+            else:
+                parts = tuple(strftime(second, part) for part in fmt.split("%f"))
+            cache[key] = parts
+        if len(parts) == 1:
+            return parts[0]
+        return ("%06d" % timestamp.microsecond).join(parts)
+
+    @staticmethod
+    def get_random_timestamp(earliest, latest, rng=random):
         if type(earliest) != datetime.datetime or type(latest) != datetime.datetime:
             raise Exception(
                 "Earliest {0} or latest {1} arguments are not datetime objects".format(
@@ -19,11 +59,13 @@ class EventgenTimestamp(object):
             raise Exception("Latest time is earlier than earliest time.")
 
         return datetime.datetime.fromtimestamp(
-            random.randint(earliest_in_epoch, latest_in_epoch)
+            rng.randint(earliest_in_epoch, latest_in_epoch)
         )
 
     @staticmethod
-    def get_random_timestamp_backfill(earliest, latest, sample_earliest, sample_latest):
+    def get_random_timestamp_backfill(
+        earliest, latest, sample_earliest, sample_latest, rng=random
+    ):
         """
 
         earliest and latest timestamp gets generated with an interval
@@ -56,7 +98,7 @@ class EventgenTimestamp(object):
         earliest_pivot_time = pivot_time + sample_earliest_in_seconds
         latest_pivot_time = pivot_time + sample_latest_in_seconds
         return datetime.datetime.fromtimestamp(
-            random.randint(earliest_pivot_time, latest_pivot_time)
+            rng.randint(earliest_pivot_time, latest_pivot_time)
         )
 
     @staticmethod
@@ -5,29 +5,41 @@ import os
 import pprint
 import random
 import re
-import time
+import threading
 import uuid
 
-import six.moves.urllib.error
-import six.moves.urllib.parse
-import six.moves.urllib.request
-
+from splunk_eventgen.lib.eventgencounter import BlockCounter
+from splunk_eventgen.lib.eventgenfile import get_replacement_file
+from splunk_eventgen.lib.eventgenrandom import (
+    RandomBuffer,
+    RandomStream,
+    batch_generator,
+)
+from splunk_eventgen.lib.eventgentimeformat import strftime
+from splunk_eventgen.lib.eventgentimestamp import EventgenTimestamp
 from splunk_eventgen.lib.logging_config import logger
 from splunk_eventgen.lib.timeparser import timeDelta2secs
 
+# Replacement value patterns for random and rated tokens, compiled once for every token
+INTEGER_RE = re.compile(r"integer\[([-]?\d+):([-]?\d+)\]", re.I)
+FLOAT_RE = re.compile(r"float\[(-?\d+|-?\d+\.(\d+)):(-?\d+|-?\d+\.(\d+))\]", re.I)
+STRING_RE = re.compile(r"string\((\d+)\)", re.I)
+HEX_RE = re.compile(r"hex\((\d+)\)", re.I)
+LIST_RE = re.compile(r"list(\[[^\]]+\])", re.I)
+
 
 class Token(object):
     """Contains data and methods for replacing a token in a given sample"""
 
-    token = None
     replacementType = None
     replacement = None
     sample = None
-    mvhash = {}
 
+    _token = None
+    _tokenRE = None
+    _replacementParsed = False
     _replaytd = None
     _lastts = None
-    _tokenfile = None
     _tokents = None
     _earliestTime = None
     _latestTime = None
@@ -38,7 +50,12 @@ class Token(object):
     _hexMatch = None
     _stringMatch = None
     _listMatch = None
-    _tokenfilecounter = 0
+    _counter = None
+    _counterLock = threading.Lock()
+    stateFile = None
+    _randomBuffer = None
+    _randomGenerator = None
+    _randomBufferChecked = False
 
     def __init__(self, sample=None):
         self._earliestTime = (None, None)
@@ -48,31 +65,165 @@ class Token(object):
         """Only used for debugging, outputs a pretty printed representation of this token"""
         # Eliminate recursive going back to parent
         temp = dict(
-            [(key, value) for (key, value) in self.__dict__.items() if key != "sample"]
+            [
+                (key, value)
+                for (key, value) in self.__dict__.items()
+                if key not in ("sample", "_randomBuffer", "_randomGenerator")
+            ]
         )
         return pprint.pformat(temp)
 
     def __repr__(self):
         return self.__str__()
 
+    def __getstate__(self):
+        # Buffered random values are local to a process, don't ship them to generator workers
+        state = self.__dict__.copy()
+        state.pop("_randomBuffer", None)
+        state.pop("_randomGenerator", None)
+        state.pop("_randomBufferChecked", None)
+        return state
+
+    def get_counter(self):
+        """
+        Returns the counter behind an integerid or seqfile token, creating it on first use.  Returns None and logs an
+        error if an integerid replacement is not an integer.
+        """
+        if self._counter is None:
+            with Token._counterLock:
+                if self._counter is None:
+                    if self.replacementType == "integerid":
+                        try:
+                            start = int(self.replacement)
+                        except (TypeError, ValueError):
+                            logger.error(
+                                "Replacement '%s' for integerid token '%s' is not an integer"
+                                % (self.replacement, self.token)
+                            )
+                            return None
+                        self._counter = BlockCounter(start, stateFile=self.stateFile)
+                    else:
+                        # seqfile keeps its order, so every value is allocated on its own
+                        self._counter = BlockCounter(0, blockSize=1)
+        return self._counter
+
+    def get_replacement_path(self, s):
+        """
+        Returns the absolute path of the replacement file of a file, mvfile, seqfile or weightedfile token and the
+        column it reads, 0 for the whole line.  Returns None and logs an error if the replacement is malformed.
+        """
+        if self._replacementFile is None:
+            try:
+                paths = self.replacement.split(":")
+                if len(paths) == 1:
+                    replacementColumn = 0
+                else:
+                    try:  # When it's not a mvfile, there's no number on the end:
+                        replacementColumn = int(paths[-1])
+                    except (ValueError):
+                        replacementColumn = 0
+                if replacementColumn > 0:
+                    # This supports having a drive-letter colon
+                    replacementFile = s.pathParser(":".join(paths[0:-1]))
+                else:
+                    replacementFile = s.pathParser(self.replacement)
+            except ValueError:
+                logger.error(
+                    "Replacement string '%s' improperly formatted. Should be /path/to/file or /path/to/file:column"
+                    % self.replacement
+                )
+                return None
+            self._replacementFile = os.path.abspath(replacementFile)
+            self._replacementColumn = replacementColumn
+        return self._replacementFile, self._replacementColumn
+
+    @property
+    def token(self):
+        return self._token
+
+    @token.setter
+    def token(self, value):
+        self._token = value
+        self._tokenRE = None
+
+    def compile(self):
+        """Compiles the token regular expression once and caches it for every later match.
+        Raises ValueError if the token is not a valid regular expression."""
+        try:
+            self._tokenRE = re.compile(self._token)
+        except (re.error, TypeError) as e:
+            raise ValueError(
+                "Could not compile token '%s' as a regular expression: %s"
+                % (self._token, e)
+            )
+        return self._tokenRE
+
+    def _regex(self):
+        return self._tokenRE if self._tokenRE is not None else self.compile()
+
     def _match(self, event):
         """Executes regular expression match and returns the re.Match object"""
-        return re.match(self.token, event)
+        return self._regex().match(event)
 
     def _search(self, event):
         """Executes regular expression search and returns the re.Match object"""
-        return re.search(self.token, event)
+        return self._regex().search(event)
 
     def _finditer(self, event):
         """Executes regular expression finditer and returns the re.Match object"""
-        return re.finditer(self.token, event)
+        return self._regex().finditer(event)
 
     def _findall(self, event):
         """Executes regular expression finditer and returns the re.Match object"""
-        return re.findall(self.token, event)
-
-    def replace(self, event, et=None, lt=None, s=None, pivot_timestamp=None):
-        """Replaces all instances of this token in provided event and returns event"""
+        return self._regex().findall(event)
+
+    def _getRandomBuffer(self, rng=None):
+        """
+        Returns the buffer of batch generated values for this token, or None if it can't be batched.  Seeded runs
+        pass their RandomStream and get a buffer of their own.
+        """
+        if not self._randomBufferChecked:
+            generator = None
+            if self.replacementType in ("random", "rated"):
+                generator = batch_generator(self.replacement)
+            self._randomGenerator = generator
+            self._randomBuffer = RandomBuffer(generator) if generator else None
+            self._randomBufferChecked = True
+        if isinstance(rng, RandomStream) and self._randomGenerator is not None:
+            return rng.buffer(self, self._randomGenerator)
+        return self._randomBuffer
+
+    def prefill(self, count, rng=None):
+        """
+        Generates count random values in one batch ahead of an interval, for tokens which support it.  integerid
+        tokens reserve count IDs for the calling thread instead.
+        """
+        if self.replacementType == "integerid":
+            counter = self.get_counter()
+            if counter is not None:
+                counter.reserve(count)
+            return
+        randomBuffer = self._getRandomBuffer(rng)
+        if randomBuffer is not None:
+            randomBuffer.fill(count)
+
+    def replace(
+        self,
+        event,
+        et=None,
+        lt=None,
+        s=None,
+        pivot_timestamp=None,
+        mvhash=None,
+        rate_factor=None,
+        rng=None,
+    ):
+        """
+        Replaces all instances of this token in provided event and returns event.  mvhash holds the lines picked for
+        mvfile tokens in this event, pass the same dict for every token of an event so they use the same line.
+        rate_factor is the sample's getTokenRateFactor() for rated tokens, looked up on every call if not passed.
+        rng is the run's RandomStream in seeded runs, the random module is used otherwise.
+        """
         offset = 0
         tokenMatch = list(self._finditer(event))
 
@@ -83,6 +234,9 @@ class Token(object):
                 lt,
                 s,
                 pivot_timestamp=pivot_timestamp,
+                mvhash=mvhash,
+                rate_factor=rate_factor,
+                rng=rng,
             )
             if replacement is not None or self.replacementType == "replaytimestamp":
                 # logger.debug("Replacement: '%s'" % replacement)
@@ -98,7 +252,7 @@ class Token(object):
                         # with the same value in multiple matches, here we'll include
                         # ones that need to be replaced for every match
                         if self.replacementType == "replaytimestamp":
-                            replacement = lt.strftime(self.replacement)
+                            replacement = strftime(lt, self.replacement)
                         offset += len(replacement) - len(match.group(1))
                     except:
                         matchStart = match.start(0) + offset
@@ -109,7 +263,7 @@ class Token(object):
                         # with the same value in multiple matches, here we'll include
                         # ones that need to be replaced for every match
                         if self.replacementType == "replaytimestamp":
-                            replacement = lt.strftime(self.replacement)
+                            replacement = strftime(lt, self.replacement)
                         offset += len(replacement) - len(match.group(0))
                     # logger.debug("matchStart %d matchEnd %d offset %d" % (matchStart, matchEnd, offset))
                     event = startEvent + replacement + endEvent
@@ -120,8 +274,18 @@ class Token(object):
         return event
 
     def _getReplacement(
-        self, old=None, earliestTime=None, latestTime=None, s=None, pivot_timestamp=None
+        self,
+        old=None,
+        earliestTime=None,
+        latestTime=None,
+        s=None,
+        pivot_timestamp=None,
+        mvhash=None,
+        rate_factor=None,
+        rng=None,
     ):
+        if rng is None:
+            rng = random
         if self.replacementType == "static":
             return self.replacement
         # This logic is done in replay.py
@@ -145,8 +309,8 @@ class Token(object):
 
                             # Get random timeDelta
                             randomDelta = datetime.timedelta(
-                                seconds=random.randint(minDelta, maxDelta),
-                                microseconds=random.randint(
+                                seconds=rng.randint(minDelta, maxDelta),
+                                microseconds=rng.randint(
                                     0,
                                     latestTime.microsecond
                                     if latestTime.microsecond > 0
@@ -160,13 +324,9 @@ class Token(object):
                         else:
                             replacementTime = s.timestamp
 
-                        replacement = self.replacement.replace(
-                            "%s",
-                            str(round(time.mktime(replacementTime.timetuple())))
-                            .rstrip("0")
-                            .rstrip("."),
+                        replacementTime = EventgenTimestamp.format_timestamp(
+                            replacementTime, self.replacement
                         )
-                        replacementTime = replacementTime.strftime(replacement)
                         # replacementTime == replacement for invalid strptime specifiers
                         if replacementTime != self.replacement.replace("%", ""):
                             return replacementTime
@@ -193,117 +353,38 @@ class Token(object):
                 )
                 return old
         elif self.replacementType in ("random", "rated"):
-            # Validations:
-            if self._integerMatch is not None:
-                integerMatch = self._integerMatch
-            else:
-                integerRE = re.compile(r"integer\[([-]?\d+):([-]?\d+)\]", re.I)
-                integerMatch = integerRE.match(self.replacement)
-                self._integerMatch = integerMatch
-
-            if self._floatMatch is not None:
-                floatMatch = self._floatMatch
-            else:
-                floatRE = re.compile(
-                    r"float\[(-?\d+|-?\d+\.(\d+)):(-?\d+|-?\d+\.(\d+))\]", re.I
-                )
-                floatMatch = floatRE.match(self.replacement)
-                self._floatMatch = floatMatch
-
-            if self._stringMatch is not None:
-                stringMatch = self._stringMatch
-            else:
-                stringRE = re.compile(r"string\((\d+)\)", re.I)
-                stringMatch = stringRE.match(self.replacement)
-                self._stringMatch = stringMatch
-
-            if self._hexMatch is not None:
-                hexMatch = self._hexMatch
-            else:
-                hexRE = re.compile(r"hex\((\d+)\)", re.I)
-                hexMatch = hexRE.match(self.replacement)
-                self._hexMatch = hexMatch
-
-            if self._listMatch is not None:
-                listMatch = self._listMatch
-            else:
-                listRE = re.compile(r"list(\[[^\]]+\])", re.I)
-                listMatch = listRE.match(self.replacement)
-                self._listMatch = listMatch
+            # Validations, only parse the replacement the first time we see it
+            if not self._replacementParsed:
+                self._integerMatch = INTEGER_RE.match(self.replacement)
+                self._floatMatch = FLOAT_RE.match(self.replacement)
+                self._stringMatch = STRING_RE.match(self.replacement)
+                self._hexMatch = HEX_RE.match(self.replacement)
+                self._listMatch = LIST_RE.match(self.replacement)
+                self._replacementParsed = True
+            integerMatch = self._integerMatch
+            floatMatch = self._floatMatch
+            stringMatch = self._stringMatch
+            hexMatch = self._hexMatch
+            listMatch = self._listMatch
 
             # Valid replacements: ipv4 | ipv6 | integer[<start>:<end>] | string(<i>)
-            if self.replacement.lower() == "ipv4":
-                x = 0
-                replacement = ""
-
-                while x < 4:
-                    replacement += str(random.randint(0, 255)) + "."
-                    x += 1
-
-                replacement = replacement.strip(".")
-                return replacement
-            elif self.replacement.lower() == "ipv6":
-                x = 0
-                replacement = ""
-
-                while x < 8:
-                    replacement += hex(random.randint(0, 65535))[2:] + ":"
-                    x += 1
-
-                replacement = replacement.strip(":")
-                return replacement
-            elif self.replacement.lower() == "mac":
-                x = 0
-                replacement = ""
-
-                # Give me 6 blocks of 2 hex
-                while x < 6:
-                    y = 0
-                    while y < 2:
-                        replacement += hex(random.randint(0, 15))[2:]
-                        y += 1
-                    replacement += ":"
-                    x += 1
-
-                replacement = replacement.strip(":")
-                return replacement
+            # ipv4, ipv6, mac, string and hex values are generated in batches and pulled from a buffer
+            if self.replacement.lower() in ("ipv4", "ipv6", "mac"):
+                return self._getRandomBuffer(rng).next()
             elif self.replacement.lower() == "guid":
+                if isinstance(rng, RandomStream):
+                    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
                 return str(uuid.uuid4())
             elif integerMatch:
                 startInt = int(integerMatch.group(1))
                 endInt = int(integerMatch.group(2))
 
                 if endInt >= startInt:
-                    replacementInt = random.randint(startInt, endInt)
+                    replacementInt = rng.randint(startInt, endInt)
                     if self.replacementType == "rated":
-                        rateFactor = 1.0
-                        if type(s.hourOfDayRate) == dict:
-                            try:
-                                rateFactor *= s.hourOfDayRate[str(s.now())]
-                            except KeyError:
-                                import traceback
-
-                                stack = traceback.format_exc()
-                                logger.error(
-                                    "Hour of day rate failed for token %s.  Stacktrace %s"
-                                    % stack
-                                )
-                        if type(s.dayOfWeekRate) == dict:
-                            try:
-                                weekday = datetime.date.weekday(s.now())
-                                if weekday == 6:
-                                    weekday = 0
-                                else:
-                                    weekday += 1
-                                rateFactor *= s.dayOfWeekRate[str(weekday)]
-                            except KeyError:
-                                import traceback
-
-                                stack = traceback.format_exc()
-                                logger.error(
-                                    "Day of week rate failed.  Stacktrace %s" % stack
-                                )
-                        replacementInt = int(round(replacementInt * rateFactor, 0))
+                        if rate_factor is None:
+                            rate_factor = s.getTokenRateFactor()
+                        replacementInt = int(round(replacementInt * rate_factor, 0))
                     replacement = str(replacementInt)
                     return replacement
                 else:
@@ -323,39 +404,12 @@ class Token(object):
 
                     if endFloat >= startFloat:
                         floatret = round(
-                            random.uniform(startFloat, endFloat), significance
+                            rng.uniform(startFloat, endFloat), significance
                         )
                         if self.replacementType == "rated":
-                            rateFactor = 1.0
-                            now = s.now()
-                            if type(s.hourOfDayRate) == dict:
-                                try:
-                                    rateFactor *= s.hourOfDayRate[str(now.hour)]
-                                except KeyError:
-                                    import traceback
-
-                                    stack = traceback.format_exc()
-                                    logger.error(
-                                        "Hour of day rate failed for token %s.  Stacktrace %s"
-                                        % stack
-                                    )
-                            if type(s.dayOfWeekRate) == dict:
-                                try:
-                                    weekday = datetime.date.weekday(now)
-                                    if weekday == 6:
-                                        weekday = 0
-                                    else:
-                                        weekday += 1
-                                    rateFactor *= s.dayOfWeekRate[str(weekday)]
-                                except KeyError:
-                                    import traceback
-
-                                    stack = traceback.format_exc()
-                                    logger.error(
-                                        "Day of week rate failed.  Stacktrace %s"
-                                        % stack
-                                    )
-                            floatret = round(floatret * rateFactor, significance)
+                            if rate_factor is None:
+                                rate_factor = s.getTokenRateFactor()
+                            floatret = round(floatret * rate_factor, significance)
                         floatret = str(floatret)
                         return floatret
                     else:
@@ -370,55 +424,8 @@ class Token(object):
                         % (floatMatch.group(1), floatMatch.group(4))
                     )
                     return old
-            elif stringMatch:
-                strLength = int(stringMatch.group(1))
-                if strLength == 0:
-                    return ""
-                elif strLength > 0:
-                    replacement = ""
-                    while len(replacement) < strLength:
-                        # Generate a random ASCII between dec 33->126
-                        replacement += chr(random.randint(33, 126))
-                        # Practice safe strings
-                        replacement = re.sub(
-                            "%[0-9a-fA-F]+",
-                            "",
-                            six.moves.urllib.parse.quote(replacement),
-                        )
-
-                    return replacement
-                else:
-                    logger.error(
-                        "Length specifier %s for string replacement must be greater than 0; will not replace"
-                        % (strLength)
-                    )
-                    return old
-            elif hexMatch:
-                strLength = int(hexMatch.group(1))
-
-                replacement = ""
-                hexList = [
-                    "0",
-                    "1",
-                    "2",
-                    "3",
-                    "4",
-                    "5",
-                    "6",
-                    "7",
-                    "8",
-                    "9",
-                    "A",
-                    "B",
-                    "C",
-                    "D",
-                    "E",
-                    "F",
-                ]
-                while len(replacement) < strLength:
-                    replacement += hexList[random.randint(0, 15)]
-
-                return replacement
+            elif stringMatch or hexMatch:
+                return self._getRandomBuffer(rng).next()
             elif listMatch:
                 try:
                     value = json.loads(listMatch.group(1))
@@ -428,7 +435,7 @@ class Token(object):
                         % (listMatch.group(1), s.name)
                     )
                     return old
-                return random.choice(value)
+                return rng.choice(value)
 
             else:
                 logger.error(
@@ -436,104 +443,70 @@ class Token(object):
                     % (self.replacement, self.replacementType)
                 )
                 return old
-        elif self.replacementType in ("file", "mvfile", "seqfile"):
-            if self._replacementFile is not None:
-                replacementFile = self._replacementFile
-                replacementColumn = self._replacementColumn
-            else:
-                try:
-                    paths = self.replacement.split(":")
-                    if len(paths) == 1:
-                        replacementColumn = 0
-                    else:
-                        try:  # When it's not a mvfile, there's no number on the end:
-                            replacementColumn = int(paths[-1])
-                        except (ValueError):
-                            replacementColumn = 0
-                    if replacementColumn > 0:
-                        # This supports having a drive-letter colon
-                        replacementFile = s.pathParser(":".join(paths[0:-1]))
-                    else:
-                        replacementFile = s.pathParser(self.replacement)
-                except ValueError:
-                    logger.error(
-                        "Replacement string '%s' improperly formatted. Should be /path/to/file or /path/to/file:column"
-                        % self.replacement
-                    )
-                    return old
-                self._replacementFile = replacementFile
-                self._replacementColumn = replacementColumn
+        elif self.replacementType in ("file", "mvfile", "seqfile", "weightedfile"):
+            replacementPath = self.get_replacement_path(s)
+            if replacementPath is None:
+                return old
+            replacementFile, replacementColumn = replacementPath
 
+            if mvhash is None:
+                mvhash = {}
             # If we've seen this file before, simply return already read results
             # This applies only if we're looking at a multivalue file and we want to
             # return the same random pick on every iteration
-            if replacementColumn > 0 and replacementFile in self.mvhash:
-                if replacementColumn > len(self.mvhash[replacementFile]):
+            if replacementColumn > 0 and replacementFile in mvhash:
+                if replacementColumn > len(mvhash[replacementFile]):
                     logger.error(
                         "Index for column '%s' in replacement file '%s' is out of bounds"
                         % (replacementColumn, replacementFile)
                     )
                     return old
                 else:
-                    # logger.debug("Returning mvhash: %s" % self.mvhash[replacementFile][replacementColumn-1])
-                    return self.mvhash[replacementFile][replacementColumn - 1]
+                    # logger.debug("Returning mvhash: %s" % mvhash[replacementFile][replacementColumn-1])
+                    return mvhash[replacementFile][replacementColumn - 1]
             else:
-                # Adding caching of the token file to avoid reading it every iteration
-                if self._tokenfile is not None:
-                    replacementLines = self._tokenfile
-                # Otherwise, lets read the file and build our cached results, pick a result and return it
-                else:
-                    # logger.debug("replacementFile: %s replacementColumn: %s" %
-                    #                   (replacementFile, replacementColumn))
-                    replacementFile = os.path.abspath(replacementFile)
-                    logger.debug("Normalized replacement file %s" % replacementFile)
-                    if os.path.exists(replacementFile) and os.path.isfile(
-                        replacementFile
-                    ):
-                        replacementFH = open(replacementFile, "rU")
-                        replacementLines = replacementFH.readlines()
-                        replacementFH.close()
-
-                        if len(replacementLines) == 0:
-                            logger.error(
-                                "Replacement file '%s' is empty; will not replace"
-                                % (replacementFile)
-                            )
-                            return old
-                        else:
-                            self._tokenfile = replacementLines
-                    else:
-                        logger.error("File '%s' does not exist" % (replacementFile))
-                        return old
+                # Lines are served from a memory mapped file shared with every other token using it
+                replacementLines = get_replacement_file(replacementFile)
+                if replacementLines is None:
+                    return old
                 if self.replacementType == "seqfile":
                     # pick value one by one from replacement file
-                    replacement = replacementLines[
-                        self._tokenfilecounter % len(replacementLines)
-                    ].strip()
-                    self._tokenfilecounter += 1
+                    lineno = self.get_counter().next() % len(replacementLines)
+                elif self.replacementType == "weightedfile":
+                    # pick value by the weight in the last column of the replacement file
+                    aliasTable = replacementLines.alias_table()
+                    if aliasTable is None:
+                        return old
+                    lineno = aliasTable.pick(rng)
                 else:
                     # pick value randomly from replacement file
-                    replacement = replacementLines[
-                        random.randint(0, len(replacementLines) - 1)
-                    ].strip()
+                    lineno = rng.randint(0, len(replacementLines) - 1)
 
-                if replacementColumn > 0:
-                    self.mvhash[replacementFile] = replacement.split(",")
+                if self.replacementType == "weightedfile":
+                    # The weight column is never part of the replacement
+                    columns = replacementLines.columns(lineno)[:-1]
+                    if replacementColumn == 0:
+                        return ",".join(columns)
+                    mvhash[replacementFile] = columns
+                elif replacementColumn > 0:
+                    mvhash[replacementFile] = replacementLines.columns(lineno)
 
-                    if replacementColumn > len(self.mvhash[replacementFile]):
+                if replacementColumn > 0:
+                    if replacementColumn > len(mvhash[replacementFile]):
                         logger.error(
                             "Index for column '%s' in replacement file '%s' is out of bounds"
                             % (replacementColumn, replacementFile)
                         )
                         return old
                     else:
-                        return self.mvhash[replacementFile][replacementColumn - 1]
+                        return mvhash[replacementFile][replacementColumn - 1]
                 else:
-                    return replacement
+                    return replacementLines.line(lineno)
         elif self.replacementType == "integerid":
-            temp = self.replacement
-            self.replacement = str(int(self.replacement) + 1)
-            return temp
+            counter = self.get_counter()
+            if counter is None:
+                return old
+            return str(counter.next())
 
         else:
             logger.error(
@@ -2,6 +2,7 @@ import datetime
 import pprint
 import random
 import time
+from itertools import repeat
 from xml.dom import minidom
 from xml.parsers.expat import ExpatError
 
@@ -11,6 +12,9 @@ import six.moves.urllib.parse
 import six.moves.urllib.request
 
 from splunk_eventgen.lib.eventgenoutput import Output
+from splunk_eventgen.lib.eventgenrandom import RandomStream
+from splunk_eventgen.lib.eventgensampleevents import SampleEvents
+from splunk_eventgen.lib.eventgentimeformat import strptime
 from splunk_eventgen.lib.eventgentimestamp import EventgenTimestamp
 from splunk_eventgen.lib.logging_config import logger
 from splunk_eventgen.lib.timeparser import timeParser
@@ -19,6 +23,14 @@ from splunk_eventgen.lib.timeparser import timeParser
 class GeneratorPlugin(object):
     sampleLines = None
     sampleDict = None
+    # Seed of this run's random stream, None uses the random module
+    randomSeed = None
+    # Random number generator for this run, a RandomStream in seeded runs
+    rng = random
+    # Whether splitCount() splits this generator's count over workers, instead of the rater dividing it up
+    splitsCount = False
+    # (start, end) of the part of the count this run generates, None for all of it
+    countRange = None
 
     def __init__(self, sample):
         self._sample = sample
@@ -78,6 +90,14 @@ class GeneratorPlugin(object):
         self.count = count
         self.start_time = start_time
         self.end_time = end_time
+        self.randomSeed = self._sample.nextRandomSeed()
+
+    def splitCount(self, parts):
+        """
+        Returns the runs to queue instead of this one to spread its count over parts workers.  Generators which set
+        splitsCount return runs with disjoint countRanges, the default is to run everything in this one.
+        """
+        return [self]
 
     def setOutputMetadata(self, event):
         if self._sample.sampletype == "csv" and (
@@ -169,9 +189,7 @@ class GeneratorPlugin(object):
                             if temptime.find("+") > 0:
                                 temptime = temptime.split("+")[0]
                             temptime = "-".join(temptime.split("-")[0:3])
-                        s.backfillts = datetime.datetime.strptime(
-                            temptime, "%Y-%m-%dT%H:%M:%S.%f"
-                        )
+                        s.backfillts = strptime(temptime, "%Y-%m-%dT%H:%M:%S.%f")
                         logger.debug(
                             "Backfill search results: '%s' value: '%s' time: '%s'"
                             % (pprint.pformat(results), temptime, s.backfillts)
@@ -210,6 +228,8 @@ class GeneratorPlugin(object):
         ):
             # Use output_counter to calculate throughput
             self._out.setOutputCounter(output_counter)
+        if self.randomSeed is not None:
+            self.rng = RandomStream(self.randomSeed)
         self.gen(
             count=self.count,
             earliest=self.start_time,
@@ -228,18 +248,54 @@ class GeneratorPlugin(object):
         send_events = []
         total_count = len(eventsDict)
         index = None
+        plan = None
+        rate_factor = None
+        timeFieldTokens = []
+        if not ignore_tokens:
+            plan = self._sample.get_replacement_plan()
+            if self._sample.timeField != "_raw":
+                timeFieldTokens = [
+                    token
+                    for token in self._sample.tokens
+                    if token.replacementType == "timestamp"
+                ]
+            # Rated tokens use the same hour and day rates for the whole interval
+            if any(token.replacementType == "rated" for token in self._sample.tokens):
+                rate_factor = self._sample.getTokenRateFactor()
+            # Generate this interval's random values for batchable tokens in one go
+            for token in self._sample.tokens:
+                token.prefill(total_count, rng=self.rng)
+        timeField = self._sample.timeField
+        if isinstance(eventsDict, SampleEvents):
+            # Read the sample a column at a time, so no dict is made per event
+            events = zip(
+                eventsDict.iter_raws(),
+                eventsDict.column("host"),
+                eventsDict.column("source"),
+                eventsDict.column("sourcetype"),
+                eventsDict.column(timeField) if timeFieldTokens else repeat(None),
+            )
+        else:
+            events = (
+                (
+                    targetevent["_raw"],
+                    targetevent["host"],
+                    targetevent["source"],
+                    targetevent["sourcetype"],
+                    targetevent[timeField] if timeFieldTokens else None,
+                )
+                for targetevent in eventsDict
+            )
         if total_count > 0:
             index = (
-                random.choice(self._sample.index_list)
+                self.rng.choice(self._sample.index_list)
                 if len(self._sample.index_list)
                 else eventsDict[0]["index"]
             )
-        for targetevent in eventsDict:
-            event = targetevent["_raw"]
+        for event, host, source, sourcetype, timeValue in events:
             # Maintain state for every token in a given event, Hash contains keys for each file name which is
             # assigned a list of values picked from a random line in that file
             mvhash = {}
-            host = targetevent["host"]
             if (
                 hasattr(self._sample, "sequentialTimestamp")
                 and self._sample.sequentialTimestamp
@@ -250,36 +306,49 @@ class GeneratorPlugin(object):
                 )
             else:
                 pivot_timestamp = EventgenTimestamp.get_random_timestamp(
-                    earliest, latest
+                    earliest, latest, rng=self.rng
                 )
             # Iterate tokens
             if not ignore_tokens:
-                for token in self._sample.tokens:
-                    token.mvhash = mvhash
-                    event = token.replace(
-                        event,
+                line_plan = plan.get(event)
+                if line_plan is not None:
+                    event = line_plan.render(
+                        plan.tokens,
                         et=earliest,
                         lt=latest,
                         s=self._sample,
                         pivot_timestamp=pivot_timestamp,
+                        mvhash=mvhash,
+                        rate_factor=rate_factor,
+                        rng=self.rng,
                     )
-                    if (
-                        token.replacementType == "timestamp"
-                        and self._sample.timeField != "_raw"
-                    ):
-                        self._sample.timestamp = None
-                        token.replace(
-                            targetevent[self._sample.timeField],
-                            et=self._sample.earliestTime(),
-                            lt=self._sample.latestTime(),
+                else:
+                    # Only run the tokens which can match this sample line
+                    for token in plan.applicable(event):
+                        event = token.replace(
+                            event,
+                            et=earliest,
+                            lt=latest,
                             s=self._sample,
                             pivot_timestamp=pivot_timestamp,
+                            mvhash=mvhash,
+                            rate_factor=rate_factor,
+                            rng=self.rng,
                         )
+                for token in timeFieldTokens:
+                    self._sample.timestamp = None
+                    token.replace(
+                        timeValue,
+                        et=self._sample.earliestTime(),
+                        lt=self._sample.latestTime(),
+                        s=self._sample,
+                        pivot_timestamp=pivot_timestamp,
+                    )
                 if self._sample.hostToken:
-                    # clear the host mvhash every time, because we need to re-randomize it
-                    self._sample.hostToken.mvhash = {}
-                if self._sample.hostToken:
-                    host = self._sample.hostToken.replace(host, s=self._sample)
+                    # The host token doesn't share the event's mvhash, so it's re-randomized every time
+                    host = self._sample.hostToken.replace(
+                        host, s=self._sample, rng=self.rng
+                    )
             try:
                 time_val = int(time.mktime(pivot_timestamp.timetuple()))
             except Exception:
@@ -289,8 +358,8 @@ class GeneratorPlugin(object):
                 "index": index,
                 "host": host,
                 "hostRegex": self._sample.hostRegex,
-                "source": targetevent["source"],
-                "sourcetype": targetevent["sourcetype"],
+                "source": source,
+                "sourcetype": sourcetype,
                 "_time": time_val,
             }
             send_events.append(temp_event)
@@ -1,11 +1,13 @@
 import datetime
 import os
 import random
+import threading
 import time
 
-from jinja2 import nodes
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, nodes
 from jinja2.ext import Extension
 
+from splunk_eventgen.lib.eventgenfile import private_directory
 from splunk_eventgen.lib.generatorplugin import GeneratorPlugin
 from splunk_eventgen.lib.logging_config import logger
 
@@ -159,14 +161,85 @@ class JinjaTime(Extension):
         return args, kwargs
 
 
+JINJA_EXTENSIONS = (
+    "jinja2.ext.do",
+    "jinja2.ext.with_",
+    "jinja2.ext.loopcontrols",
+    JinjaTime,
+)
+
+# Jinja environments shared by every generator run in this process, keyed by template directory, extensions and
+# where compiled templates are saved.  Environments keep the templates they compiled and compile them again when
+# the template file changes.
+_environments = {}
+_environmentsLock = threading.Lock()
+
+
+def get_bytecode_cache(bytecode_cache_dir=None):
+    """
+    Returns the cache compiled templates are saved in.  Without bytecode_cache_dir, that's Jinja's own cache directory
+    for the current user, which Jinja checks the ownership of.  bytecode_cache_dir is used only if it's owned by the
+    current user and has mode 0700, otherwise compiled templates aren't saved and None is returned.
+    """
+    if not bytecode_cache_dir:
+        return FileSystemBytecodeCache()
+    if not private_directory(bytecode_cache_dir):
+        return None
+    return FileSystemBytecodeCache(bytecode_cache_dir)
+
+
+def get_environment(template_dir, bytecode_cache=False, bytecode_cache_dir=None):
+    """Returns the Jinja environment loading templates from template_dir"""
+    key = (
+        template_dir,
+        JINJA_EXTENSIONS,
+        bool(bytecode_cache),
+        bytecode_cache_dir if bytecode_cache else None,
+    )
+    try:
+        return _environments[key]
+    except KeyError:
+        pass
+    with _environmentsLock:
+        if key not in _environments:
+            bcc = get_bytecode_cache(bytecode_cache_dir) if bytecode_cache else None
+            _environments[key] = Environment(
+                loader=FileSystemLoader(
+                    [template_dir], encoding="utf-8", followlinks=False
+                ),
+                extensions=list(JINJA_EXTENSIONS),
+                line_statement_prefix="#",
+                line_comment_prefix="##",
+                auto_reload=True,
+                bytecode_cache=bcc,
+            )
+        return _environments[key]
+
+
+def clear_environments():
+    """Forgets every Jinja environment and the templates they compiled"""
+    with _environmentsLock:
+        _environments.clear()
+
+
 class JinjaGenerator(GeneratorPlugin):
-    validSettings = ["jinja_count_type", "jinja_target_template", "jinja_template_dir"]
+    validSettings = [
+        "jinja_count_type",
+        "jinja_target_template",
+        "jinja_template_dir",
+        "jinja_bytecode_cache",
+        "jinja_bytecode_cache_dir",
+    ]
     defaultableSettings = [
         "jinja_count_type",
         "jinja_target_template",
         "jinja_template_dir",
+        "jinja_bytecode_cache",
+        "jinja_bytecode_cache_dir",
     ]
+    boolSettings = ["jinja_bytecode_cache"]
     jsonSettings = ["jinja_variables"]
+    splitsCount = True
 
     def __init__(self, sample):
         GeneratorPlugin.__init__(self, sample)
@@ -197,11 +270,67 @@ class JinjaGenerator(GeneratorPlugin):
                 )
             )
 
+    def _complete_event(self, event):
+        """Checks an event from the template has _time and _raw, and fills in the sample's fields it doesn't set"""
+        if "_time" not in event:
+            # TODO: Add a custom exception here
+            raise Exception(
+                "No _time field supplied, please add time to your jinja template."
+            )
+        if "_raw" not in event:
+            # TODO: Add a custom exception here
+            raise Exception(
+                "No _raw field supplied, please add time to your jinja template."
+            )
+        if "host" not in event:
+            event["host"] = self._sample.host
+        if "hostRegex" not in event:
+            event["hostRegex"] = self._sample.hostRegex
+        if "source" not in event:
+            event["source"] = self._sample.source
+        if "sourcetype" not in event:
+            event["sourcetype"] = self._sample.sourcetype
+        if "index" not in event:
+            event["index"] = self._sample.index
+        return event
+
+    def _make_emit(self, lines_out):
+        """
+        Returns the eventgen_emit() function templates call with an event dict, or the fields of an event as keyword
+        arguments.  The event goes to lines_out as it is, in the order the template renders, so it's never turned into
+        JSON and parsed back and its _raw can span lines.  It renders as an empty string.
+        """
+
+        def eventgen_emit(event=None, **fields):
+            event = dict(event or {}, **fields)
+            lines_out.append(self._complete_event(event))
+            return ""
+
+        return eventgen_emit
+
+    def splitCount(self, parts):
+        """
+        Splits the count into parts disjoint ranges of eventgen_count, one run each.  Every run still slices time by
+        the whole count, so the runs render the same cycles and time slices this one would have, just in parallel.
+        """
+        count = self.count
+        if count is None or count < 2 or parts < 2:
+            return [self]
+        parts = int(min(parts, count))
+        runs = []
+        for part in range(parts):
+            run = self.__class__(self._sample)
+            run.updateCounts(
+                count=count, start_time=self.start_time, end_time=self.end_time
+            )
+            run.countRange = (count * part // parts, count * (part + 1) // parts)
+            run.updateConfig(config=self.config, outqueue=self.outputQueue)
+            runs.append(run)
+        return runs
+
     def gen(self, count, earliest, latest, samplename=None):
         # TODO: Figure out how to gracefully tell generator plugins to exit when there is an error.
         try:
-            from jinja2 import Environment, FileSystemLoader
-
             self.target_count = count
             # assume that if there is no "count" field, we want to run 1 time, and only one time.
             if self.target_count == -1:
@@ -241,18 +370,10 @@ class JinjaGenerator(GeneratorPlugin):
                 raise CantFindTemplate(
                     "Template to load not specified in eventgen conf for stanza.  Skipping Stanza"
                 )
-            jinja_env = Environment(
-                loader=FileSystemLoader(
-                    [target_template_dir], encoding="utf-8", followlinks=False
-                ),
-                extensions=[
-                    "jinja2.ext.do",
-                    "jinja2.ext.with_",
-                    "jinja2.ext.loopcontrols",
-                    JinjaTime,
-                ],
-                line_statement_prefix="#",
-                line_comment_prefix="##",
+            jinja_env = get_environment(
+                target_template_dir,
+                getattr(self._sample, "jinja_bytecode_cache", False),
+                getattr(self._sample, "jinja_bytecode_cache_dir", None),
             )
 
             jinja_loaded_template = jinja_env.get_template(
@@ -277,7 +398,10 @@ class JinjaGenerator(GeneratorPlugin):
             self.latest_epoch = (
                 self.latest - datetime.datetime(1970, 1, 1)
             ).total_seconds()
-            while self.current_count < self.target_count:
+            end_count = self.target_count
+            if self.countRange is not None:
+                self.current_count, end_count = self.countRange
+            while self.current_count < end_count:
                 self.end_of_cycle = False
                 jinja_loaded_vars["eventgen_count"] = self.current_count
                 (
@@ -292,8 +416,10 @@ class JinjaGenerator(GeneratorPlugin):
                     self.current_count,
                     slice_type="random",
                 )
-                self.jinja_stream = jinja_loaded_template.stream(jinja_loaded_vars)
                 lines_out = []
+                # Templates can hand events to eventgen_emit() instead of rendering them as JSON
+                jinja_loaded_vars["eventgen_emit"] = self._make_emit(lines_out)
+                self.jinja_stream = jinja_loaded_template.stream(jinja_loaded_vars)
                 try:
                     for raw_line in self.jinja_stream:
                         # trim the newline char for jinja output
@@ -309,36 +435,14 @@ class JinjaGenerator(GeneratorPlugin):
                                         line
                                     )
                                 )
-                                logger.error(
-                                    "Parse Failure Reason: {0}".format(e.message)
-                                )
+                                logger.error("Parse Failure Reason: {0}".format(e))
                                 logger.error(
                                     "Please note, you must meet the requirements for json.loads in python if you have"
                                     + "not installed ujson. Native python does not support multi-line events."
+                                    + " Use eventgen_emit() to pass events without JSON."
                                 )
                                 continue
-                            current_line_keys = list(target_line.keys())
-                            if "_time" not in current_line_keys:
-                                # TODO: Add a custom exception here
-                                raise Exception(
-                                    "No _time field supplied, please add time to your jinja template."
-                                )
-                            if "_raw" not in current_line_keys:
-                                # TODO: Add a custom exception here
-                                raise Exception(
-                                    "No _raw field supplied, please add time to your jinja template."
-                                )
-                            if "host" not in current_line_keys:
-                                target_line["host"] = self._sample.host
-                            if "hostRegex" not in current_line_keys:
-                                target_line["hostRegex"] = self._sample.hostRegex
-                            if "source" not in current_line_keys:
-                                target_line["source"] = self._sample.source
-                            if "sourcetype" not in current_line_keys:
-                                target_line["sourcetype"] = self._sample.sourcetype
-                            if "index" not in current_line_keys:
-                                target_line["index"] = self._sample.index
-                            lines_out.append(target_line)
+                            lines_out.append(self._complete_event(target_line))
                 except TypeError as e:
                     logger.exception(str(e))
                 self.end_of_cycle = True
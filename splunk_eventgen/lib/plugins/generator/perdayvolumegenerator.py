@@ -1,5 +1,4 @@
 import datetime
-import random
 
 from splunk_eventgen.lib.generatorplugin import GeneratorPlugin
 from splunk_eventgen.lib.logging_config import logger
@@ -60,7 +59,7 @@ class PerDayVolumeGenerator(GeneratorPlugin):
                 % (self._sample.name, self._sample.app, size)
             )
             while currentSize < size:
-                currentevent = self._sample.sampleDict[random.randint(0, sdlen - 1)]
+                currentevent = self._sample.sampleDict[self.rng.randint(0, sdlen - 1)]
                 eventsDict.append(currentevent)
                 currentSize += len(currentevent["_raw"])
 
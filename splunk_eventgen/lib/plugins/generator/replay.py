@@ -1,18 +1,50 @@
 # TODO Add timestamp detection for common timestamp format
 import datetime
+import functools
+import queue
+import re
 import time
+from array import array
 
+from splunk_eventgen.lib.eventgensamplecache import (
+    MISSING_TIME,
+    load_times,
+    save_times,
+    to_datetime,
+    to_micros,
+)
+from splunk_eventgen.lib.eventgensampleindex import SampleIndex
 from splunk_eventgen.lib.generatorplugin import GeneratorPlugin
-from splunk_eventgen.lib.logging_config import logger
+from splunk_eventgen.lib.logging_config import logger, metrics_logger
+
+# Seconds after an event is due that later events are still sent in the same batch, unless replayTick is set
+REPLAY_TICK = 0.01
+# Seconds between reports of how far a replay is behind its timeline
+LAG_REPORT_INTERVAL = 10
+# Fields of a replay event a sample can be partitioned by
+PARTITION_FIELDS = ("_raw", "host", "source", "sourcetype", "index")
+
+# Seconds a partitioned replay waits for its partitions after the end of the sample's timeline
+PARTITION_GRACE = 60
 
 
 class ReplayGenerator(GeneratorPlugin):
+    validSettings = ["replayTick", "replayPartition", "replayPartitionRegex"]
+    defaultableSettings = ["replayTick", "replayPartition", "replayPartitionRegex"]
+    floatSettings = ["replayTick"]
     queueable = False
+    # Queue partitions of the sample are put on for the generator workers, set by the rater
+    generatorQueue = None
+    # Manager of the eventgen when generator workers are processes, set by the rater
+    manager = None
+    # (start, replay events, done queue) of a run replaying one part of a partitioned sample
+    _partition = None
     _rpevents = None
     _currentevent = None
     _times = None
     _timeSinceSleep = None
     _lastts = None
+    _rateFactor = None
 
     def __init__(self, sample):
         GeneratorPlugin.__init__(self, sample)
@@ -45,153 +77,415 @@ class ReplayGenerator(GeneratorPlugin):
 
         # Iterate tokens
         eventraw = replayed_event["_raw"]
-        for token in self._sample.tokens:
-            token.mvhash = mvhash
+        # Only run the tokens which can match this sample line
+        for token in self._sample.get_replacement_plan().applicable(eventraw):
             if token.replacementType in ["timestamp", "replaytimestamp"]:
                 eventraw = token.replace(
                     eventraw, et=event_time, lt=event_time, s=self._sample
                 )
             else:
-                eventraw = token.replace(eventraw, s=self._sample)
-        if self._sample.hostToken:
-            # clear the host mvhash every time, because we need to re-randomize it
-            self._sample.hostToken.mvhash = {}
+                eventraw = token.replace(
+                    eventraw,
+                    s=self._sample,
+                    mvhash=mvhash,
+                    rate_factor=self._rateFactor,
+                    rng=self.rng,
+                )
 
+        # The host token doesn't share the event's mvhash, so it's re-randomized every time
         host = replayed_event["host"]
         if self._sample.hostToken:
-            send_event["host"] = self._sample.hostToken.replace(host, s=self._sample)
+            send_event["host"] = self._sample.hostToken.replace(
+                host, s=self._sample, rng=self.rng
+            )
 
         send_event["_raw"] = eventraw
         return send_event
 
-    def load_sample_file(self):
-        line_list = []
-        for line in self._sample.get_loaded_sample():
-            # Add newline to a raw line if necessary
-            try:
-                if line["_raw"][-1] != "\n":
-                    line["_raw"] += "\n"
-                current_event_timestamp = False
-                index = line.get("index", self._sample.index)
-                host = line.get("host", self._sample.host)
-                hostRegex = line.get("hostRegex", self._sample.hostRegex)
-                source = line.get("source", self._sample.source)
-                sourcetype = line.get("sourcetype", self._sample.sourcetype)
-                rpevent = {
-                    "_raw": line["_raw"],
-                    "index": index,
-                    "host": host,
-                    "hostRegex": hostRegex,
-                    "source": source,
-                    "sourcetype": sourcetype,
-                }
-            except:
-                if line[-1] != "\n":
-                    line += "\n"
-
-                rpevent = {
-                    "_raw": line,
-                    "index": self._sample.index,
-                    "host": self._sample.host,
-                    "hostRegex": self._sample.hostRegex,
-                    "source": self._sample.source,
-                    "sourcetype": self._sample.sourcetype,
-                }
+    def make_replay_event(self, line, base_time):
+        """Returns the replay event for a sample line or event dict"""
+        # Add newline to a raw line if necessary
+        try:
+            if line["_raw"][-1] != "\n":
+                line["_raw"] += "\n"
+            index = line.get("index", self._sample.index)
+            host = line.get("host", self._sample.host)
+            hostRegex = line.get("hostRegex", self._sample.hostRegex)
+            source = line.get("source", self._sample.source)
+            sourcetype = line.get("sourcetype", self._sample.sourcetype)
+            rpevent = {
+                "_raw": line["_raw"],
+                "index": index,
+                "host": host,
+                "hostRegex": hostRegex,
+                "source": source,
+                "sourcetype": sourcetype,
+            }
+        except:
+            if line[-1] != "\n":
+                line += "\n"
+
+            rpevent = {
+                "_raw": line,
+                "index": self._sample.index,
+                "host": self._sample.host,
+                "hostRegex": self._sample.hostRegex,
+                "source": self._sample.source,
+                "sourcetype": self._sample.sourcetype,
+            }
+        rpevent["base_time"] = base_time
+        return rpevent
+
+    def parse_base_time(self, line):
+        """Returns the timestamp of a sample event dict, or None if it doesn't have one"""
+        try:
+            return self._sample.getTSFromEvent(line[self._sample.timeField])
+        except Exception:
             try:
-                current_event_timestamp = self._sample.getTSFromEvent(
-                    rpevent[self._sample.timeField]
+                logger.error(
+                    "Sample timeField {} failed to locate. Trying to locate _time field.".format(
+                        self._sample.timeField
+                    )
                 )
-                rpevent["base_time"] = current_event_timestamp
+                return self._sample.getTSFromEvent(line["_time"])
             except Exception:
-                try:
-                    current_event_timestamp = self._sample.getTSFromEvent(
-                        line[self._sample.timeField]
-                    )
-                    rpevent["base_time"] = current_event_timestamp
-                except Exception:
-                    try:
-                        logger.error(
-                            "Sample timeField {} failed to locate. Trying to locate _time field.".format(
-                                self._sample.timeField
-                            )
-                        )
-                        current_event_timestamp = self._sample.getTSFromEvent(
-                            line["_time"]
-                        )
-                    except Exception:
-                        logger.exception("Extracting timestamp from an event failed.")
-                        continue
-            line_list.append(rpevent)
-        # now interate the list 1 time and figure out the time delta of every event
-        current_event = None
-        previous_event = None
-        for index, line in enumerate(line_list):
-            current_event = line
-            # if it's the first event, there is no previous event.
-            if index == 0:
-                previous_event = current_event
-            else:
-                previous_event = line_list[index - 1]
-            # Refer to the last event to calculate the new backfill time
-            time_difference = (
-                current_event["base_time"] - previous_event["base_time"]
-            ) * self._sample.timeMultiple
-            current_event["timediff"] = time_difference
-        return line_list
+                logger.exception("Extracting timestamp from an event failed.")
+                return None
+
+    def get_base_times(self, events):
+        """
+        Returns the base time of every sample event, as an array of to_micros() values, and the time from the event
+        with a timestamp before it to every event, as an array of microseconds.  Timestamps are only parsed the first
+        time a sample is replayed, after that they're kept with the sample and saved to the sample cache, keyed by
+        everything getTSFromEvent() depends on.
+        """
+        key = (
+            "replay",
+            self._sample.sampletype,
+            self._sample.breaker,
+            bool(self._sample.streamSample),
+            self._sample.timeField,
+            tuple(
+                (token.token, token.replacementType, token.replacement)
+                for token in self._sample.tokens
+            ),
+            # Timestamps without a year get this year, and %s ones are converted to local time
+            self._sample.now().year,
+            time.timezone,
+            time.altzone,
+        )
+        if self._sample._baseTimes is not None:
+            cachedKey, times, timediffs = self._sample._baseTimes
+            if cachedKey == key and len(times) == len(events):
+                return times, timediffs
+        times = load_times(self._sample.filePath, key, self._sample.sampleCacheDir)
+        if times is None or len(times) != len(events):
+            logger.debug(
+                "Parsing timestamps of sample '%s' in app '%s'"
+                % (self._sample.name, self._sample.app)
+            )
+            times = array(
+                "q", (to_micros(self.parse_base_time(line)) for line in events)
+            )
+            save_times(self._sample.filePath, key, times, self._sample.sampleCacheDir)
+        timediffs = array("q", bytes(times.itemsize * len(times)))
+        previous = None
+        for index, base_time in enumerate(times):
+            if base_time == MISSING_TIME:
+                continue
+            if previous is not None:
+                timediffs[index] = base_time - previous
+            previous = base_time
+        self._sample._baseTimes = (key, times, timediffs)
+        return times, timediffs
+
+    def replay_event(self, line, base_time, timediff):
+        rpevent = self.make_replay_event(line, to_datetime(base_time))
+        rpevent["timediff"] = (
+            datetime.timedelta(microseconds=timediff) * self._sample.timeMultiple
+        )
+        return rpevent
+
+    def load_sample_file(self):
+        self._sample.loadSample()
+        sample_events = self._sample.sampleDict
+        times, timediffs = self.get_base_times(sample_events)
+        return [
+            self.replay_event(line, base_time, timediff)
+            for line, base_time, timediff in zip(sample_events, times, timediffs)
+            if base_time != MISSING_TIME
+        ]
+
+    def stream_sample_events(self, reverse=False):
+        """
+        Yields the replay events of a streamed sample one at a time, so the sample is never held in memory.  With
+        reverse the events come last to first, each still carrying its time delta to the event before it in the file.
+        """
+        events = self._sample.sampleDict
+        times, timediffs = self.get_base_times(events)
+        if reverse:
+            order = range(len(events) - 1, -1, -1)
+        else:
+            order = range(len(events))
+        for index in order:
+            if times[index] != MISSING_TIME:
+                yield self.replay_event(events[index], times[index], timediffs[index])
+
+    def report_lag(self, events, lag, max_lag):
+        metrics_logger.info(
+            {
+                "timestamp": datetime.datetime.strftime(
+                    datetime.datetime.now(), "%Y-%m-%d %H:%M:%S"
+                ),
+                "sample": self._sample.name,
+                "events": events,
+                "replay_lag": round(lag, 6),
+                "replay_max_lag": round(max_lag, 6),
+            }
+        )
+
+    def send_on_schedule(self, rpevents, earliest, latest, start=None):
+        """
+        Sends replay events on the sample's timeline, starting now or at the time.monotonic() start.  Every event is
+        due at a fixed offset from the start, the sum of the time deltas up to it, and goes out stamped with that time
+        after current_time, so time spent sleeping or replacing tokens never adds up to drift.  The events due within
+        replayTick seconds of the first one waiting, or overdue, go out together in one batch.  How far the batches are
+        behind the timeline, in seconds, is reported to the metrics log every LAG_REPORT_INTERVAL seconds and at the
+        end.  Returns how many events were sent
+        and the most any batch was behind.
+        """
+        tick = getattr(self._sample, "replayTick", None)
+        tick = REPLAY_TICK if tick is None else float(tick)
+        if start is None:
+            start = time.monotonic()
+        offset = datetime.timedelta()
+        batch = []
+        batch_deadline = release_before = None
+        reported = start
+        events = 0
+        lag = max_lag = 0.0
+        for index, rpevent in enumerate(rpevents):
+            if rpevent["timediff"] < datetime.timedelta():
+                logger.error(
+                    "Can't go back in time, please make sure your events are in time order. "
+                    "see line Number{0}".format(index)
+                )
+                logger.error("Event: {0}".format(rpevent))
+            offset += rpevent["timediff"]
+            deadline = start + offset.total_seconds()
+            send_event = self.set_time_and_tokens(
+                rpevent, self.current_time + offset, earliest, latest
+            )
+            if batch and deadline > release_before:
+                self._out.bulksend(batch)
+                events += len(batch)
+                batch = []
+            if not batch:
+                now = time.monotonic()
+                if deadline > now:
+                    time.sleep(deadline - now)
+                    now = time.monotonic()
+                batch_deadline = deadline
+                release_before = max(now, deadline) + tick
+                lag = now - deadline
+                max_lag = max(max_lag, lag)
+                if now - reported >= LAG_REPORT_INTERVAL:
+                    self.report_lag(events, lag, max_lag)
+                    reported = now
+            batch.append(send_event)
+        if batch:
+            self._out.bulksend(batch)
+            events += len(batch)
+        if batch_deadline is not None:
+            self.report_lag(events, lag, max_lag)
+        return events, max_lag
+
+    def partition_key(self):
+        """
+        Returns a function giving the partition of a replay event, or None when the sample isn't partitioned.  Events
+        are partitioned by the value of replayPartition, or the first group of replayPartitionRegex in it, or all of
+        the match if the regex has no groups.  Events the regex doesn't match share one partition.
+        """
+        field = getattr(self._sample, "replayPartition", None)
+        if not field:
+            return None
+        if field not in PARTITION_FIELDS:
+            logger.error(
+                "Can't partition sample '%s' by '%s', replayPartition must be one of %s"
+                % (self._sample.name, field, ", ".join(PARTITION_FIELDS))
+            )
+            return None
+        pattern = getattr(self._sample, "replayPartitionRegex", None)
+        if not pattern:
+            return lambda rpevent: rpevent[field]
+        try:
+            regex = re.compile(pattern)
+        except re.error as e:
+            logger.error(
+                "Invalid replayPartitionRegex '%s' for sample '%s': %s"
+                % (pattern, self._sample.name, e)
+            )
+            return None
+        group = 1 if regex.groups else 0
+
+        def key(rpevent):
+            match = regex.search(rpevent[field])
+            return match.group(group) if match else None
+
+        return key
+
+    def partition_events(self, rpevents, key, parts):
+        """
+        Splits replay events into at most parts lists, keeping every partition whole and in one list, and the lists
+        about the same size.  The events of each list keep their place on the whole sample's timeline: their time
+        deltas are made to add up to the same offsets from the start.
+        """
+        partitions = {}
+        offset = datetime.timedelta()
+        for rpevent in rpevents:
+            offset += rpevent["timediff"]
+            partitions.setdefault(key(rpevent), []).append((offset, rpevent))
+        lists = [[] for _ in range(min(parts, len(partitions)))]
+        # Biggest partitions first, each to the list with the fewest events so far
+        for events in sorted(partitions.values(), key=len, reverse=True):
+            min(lists, key=len).extend(events)
+        for i, events in enumerate(lists):
+            events.sort(key=lambda event: event[0])
+            previous = datetime.timedelta()
+            lists[i] = []
+            for offset, rpevent in events:
+                rpevent = dict(rpevent, timediff=offset - previous)
+                previous = offset
+                lists[i].append(rpevent)
+        return lists
+
+    def done_queue(self):
+        """Returns a queue the generator workers can report finished partitions on"""
+        if self.manager is not None:
+            return self.manager.Queue()
+        return queue.Queue()
+
+    def replay_partitions(self, rpevents, key, earliest, latest):
+        """
+        Replays the partitions of the sample at the same time, each list of partition_events() on its own generator
+        worker, and waits for them to finish, or until PARTITION_GRACE seconds after the end of the sample's timeline
+        if some never report back.  The first list is replayed on this worker, so only generatorWorkers - 1 others
+        are needed and a partition never waits for this one to finish.  Every worker schedules its own events from the
+        same start, so together they send the events at the sample's rate.  Returns how many events the finished
+        partitions sent.
+        """
+        workers = int(self.config.generatorWorkers)
+        lists = self.partition_events(rpevents, key, workers)
+        if not lists:
+            # No event of the sample has a timestamp
+            return 0
+        timeline = max(
+            sum((rpevent["timediff"] for rpevent in events), datetime.timedelta())
+            for events in lists
+        )
+        done = self.done_queue()
+        start = time.monotonic()
+        deadline = start + timeline.total_seconds() + PARTITION_GRACE
+        for events in lists[1:]:
+            run = self.__class__(self._sample)
+            run.updateCounts(
+                count=self.count, start_time=self.start_time, end_time=self.end_time
+            )
+            run.updateConfig(config=self.config, outqueue=self.outputQueue)
+            run.current_time = self.current_time
+            run._rateFactor = self._rateFactor
+            run._partition = (start, events, done)
+            self.generatorQueue.put(run)
+        sent, max_lag = self.send_on_schedule(lists[0], earliest, latest, start=start)
+        self._out.flush(endOfInterval=True)
+        finished = 1
+        while finished < len(lists) and not self.config.stopping:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.error(
+                    "%d of %d partitions of sample '%s' did not finish replaying, not waiting for them any longer"
+                    % (len(lists) - finished, len(lists), self._sample.name)
+                )
+                break
+            try:
+                events, lag = done.get(timeout=min(remaining, 1))
+            except queue.Empty:
+                continue
+            finished += 1
+            sent += events
+            max_lag = max(max_lag, lag)
+        elapsed = time.monotonic() - start
+        metrics_logger.info(
+            {
+                "timestamp": datetime.datetime.strftime(
+                    datetime.datetime.now(), "%Y-%m-%d %H:%M:%S"
+                ),
+                "sample": self._sample.name,
+                "events": sent,
+                "replay_partitions": len(lists),
+                "replay_rate": round(sent / elapsed, 3) if elapsed else sent,
+                "replay_max_lag": round(max_lag, 6),
+            }
+        )
+        return sent
 
     def gen(self, count, earliest, latest, samplename=None):
+        if self._partition is not None:
+            # Part of a partitioned replay, running on a generator worker
+            start, rpevents, done = self._partition
+            result = (0, 0.0)
+            try:
+                result = self.send_on_schedule(rpevents, earliest, latest, start=start)
+                self._out.flush(endOfInterval=True)
+            finally:
+                done.put(result)
+            return
         # 9/8/15 CS Check to make sure we have events to replay
         self._sample.loadSample()
         self.current_time = self._sample.now()
-        line_list = self.load_sample_file()
+        # Rated tokens use the same hour and day rates for the whole replay
+        self._rateFactor = self._sample.getTokenRateFactor(self.current_time)
+        if isinstance(self._sample.sampleDict, SampleIndex):
+            replay_events = self.stream_sample_events
+            reversed_events = functools.partial(self.stream_sample_events, reverse=True)
+        else:
+            line_list = self.load_sample_file()
+            replay_events = functools.partial(iter, line_list)
+            reversed_events = functools.partial(reversed, line_list)
         # If backfill exists, calculate the start of the backfill time relative to the current time.
         # Otherwise, backfill time equals to the current time
         self.backfill_time = self._sample.get_backfill_time(self.current_time)
         # if we have backfill, replay the events backwards until we hit the backfill
         if self.backfill_time != self.current_time and not self._sample.backfilldone:
             backfill_count_time = self.current_time
-            current_backfill_index = len(line_list) - 1
+            backfill_iter = reversed_events()
             backfill_events = []
             while backfill_count_time >= self.backfill_time:
-                rpevent = line_list[current_backfill_index]
+                rpevent = next(backfill_iter, None)
+                if rpevent is None:
+                    # Start over from the last event
+                    backfill_iter = reversed_events()
+                    rpevent = next(backfill_iter)
                 backfill_count_time = backfill_count_time - rpevent["timediff"]
                 backfill_events.append(
                     self.set_time_and_tokens(
                         rpevent, backfill_count_time, earliest, latest
                     )
                 )
-                current_backfill_index -= 1
-                if current_backfill_index < 0:
-                    current_backfill_index = len(line_list) - 1
             backfill_events.reverse()
             self._out.bulksend(backfill_events)
             self._sample.backfilldone = True
-        previous_event = None
-        for index, rpevent in enumerate(line_list):
-            if previous_event is None:
-                current_event = self.set_time_and_tokens(
-                    rpevent, self.backfill_time, earliest, latest
-                )
-                previous_event = current_event
-                previous_event_timediff = rpevent["timediff"]
-                self._out.bulksend([current_event])
-                continue
-            try:
-                time.sleep(previous_event_timediff.total_seconds())
-            except ValueError:
-                logger.error(
-                    "Can't sleep for negative time, please make sure your events are in time order."
-                    "see line Number{0}".format(index)
-                )
-                logger.error("Event: {0}".format(rpevent))
-                pass
-            current_time = datetime.datetime.now()
-            previous_event = rpevent
-            previous_event_timediff = rpevent["timediff"]
-            send_event = self.set_time_and_tokens(
-                rpevent, current_time, earliest, latest
-            )
-            self._out.bulksend([send_event])
+        key = self.partition_key()
+        if (
+            key is not None
+            and self.generatorQueue is not None
+            and int(self.config.generatorWorkers) > 1
+        ):
+            # Send the backfill before the partitions start
+            self._out.flush(endOfInterval=True)
+            self.replay_partitions(replay_events(), key, earliest, latest)
+            return
+        self.send_on_schedule(replay_events(), earliest, latest)
         self._out.flush(endOfInterval=True)
         return
 
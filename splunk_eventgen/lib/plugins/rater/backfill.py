@@ -51,9 +51,11 @@ class BackfillRater(ConfigRater):
                     # Need to lock on replay mode since event duration is dynamic.  Interval starts counting
                     # after the replay has finished.
                     if self.sample.generator == "replay":
+                        genPlugin.generatorQueue = self.generatorQueue
+                        genPlugin.manager = self.manager
                         genPlugin.run()
                     else:
-                        self.generatorQueue.put(genPlugin)
+                        self.queue_generator(genPlugin)
                 except Full:
                     logger.warning("Generator Queue Full. Skipping current generation.")
                 # due to replays needing to iterate in reverse, it's more efficent to process backfill
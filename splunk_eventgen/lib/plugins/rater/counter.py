@@ -31,7 +31,7 @@ class CountRater(RaterPlugin):
             genPlugin.updateConfig(config=self.config, outqueue=self.outputQueue)
             genPlugin.updateCounts(count=count, start_time=et, end_time=lt)
             try:
-                self.generatorQueue.put(genPlugin)
+                self.queue_generator(genPlugin)
                 logger.info(
                     (
                         "Put {0} MB of events in queue for sample '{1}'"
@@ -40,7 +40,7 @@ class PerDayVolume(ConfigRater):
         genPlugin.updateConfig(config=self.config, outqueue=self.outputQueue)
         genPlugin.updateCounts(count=count, start_time=et, end_time=lt)
         try:
-            self.generatorQueue.put(genPlugin)
+            self.queue_generator(genPlugin)
         except Full:
             logger.warning("Generator Queue Full. Skipping current generation.")
 
@@ -15,6 +15,7 @@ class RaterPlugin(object):
         self.sample = sample
         self.config = None
         self.generatorQueue = None
+        self.manager = None
         self.outputQueue = None
         self.outputPlugin = None
         self.generatorPlugin = None
@@ -192,9 +193,12 @@ class RaterPlugin(object):
                         output_counter = OutputCounter()
                     elif hasattr(self.config, "outputCounter"):
                         output_counter = self.config.outputCounter
+                    # Partitioned replays hand their partitions to the generator workers
+                    genPlugin.generatorQueue = self.generatorQueue
+                    genPlugin.manager = self.manager
                     genPlugin.run(output_counter=output_counter)
                 else:
-                    self.generatorQueue.put(genPlugin)
+                    self.queue_generator(genPlugin)
             except Full:
                 logger.warning("Generator Queue Full. Skipping current generation.")
 
@@ -207,8 +211,27 @@ class RaterPlugin(object):
         """
         self.single_queue_it(count)
 
+    def split_workers(self):
+        """Returns how many workers splitSample spreads a run over"""
+        if self.sample.splitSample == 1:
+            return int(self.config.generatorWorkers)
+        return int(self.sample.splitSample)
+
+    def queue_generator(self, genPlugin):
+        """
+        Puts genPlugin in the generator queue.  With splitSample set, generators which split their count themselves put
+        one run per worker instead, each generating its own part of the count.
+        :param genPlugin:
+        :return:
+        """
+        runs = [genPlugin]
+        if self.sample.splitSample > 0 and genPlugin.splitsCount:
+            runs = genPlugin.splitCount(self.split_workers())
+        for run in runs:
+            self.generatorQueue.put(run)
+
     def queue_it(self, count):
-        if self.sample.splitSample > 0:
+        if self.sample.splitSample > 0 and not self.generatorPlugin.splitsCount:
             self.multi_queue_it(count)
         else:
             self.single_queue_it(count)
@@ -81,6 +81,7 @@ disableLoggingQueue = true
         * rated -> float[<start.numzerosforprecision>:<end.numzerosforprecision>]
         * file -> <replacment file name>
         * mvfile -> <replacement file name, expects CSV file>:<column number>
+        * weightedfile -> <replacement file name, expects CSV file with weight as last column> OR <replacement file name>:<column number>
 
 disabled = true | false
     * Like what it looks like.  Will disable event generation for this sample.
@@ -92,6 +93,17 @@ sampleDir = <dir>
     * When sampleDir is an absolute path, eventgen will load the sample files from the path directly. But absolute path is not recommended, absolute path makes your configuration not work with different OS.
     * When sampleDir is a relative path, eventgen takes conf_file_dir as the base path when resolve sampleDir. For example, sampleDir=../../my_sample will be resolved to <conf_file_dir>/../../my_sample. conf_file_dir is the directory where eventgen conf file locates.
 
+stateDir = <dir>
+    * Directory the next value of every integerid token is saved in, so a restarted eventgen carries on where it stopped.
+    * Defaults to none, integerid tokens always start from their configured replacement and nothing is saved.
+    * State files earlier versions saved in the sample directory are still read, when stateDir is not set or has no
+      state for the token yet, but they are no longer written.
+
+sampleCacheDir = <dir>
+    * Directory the broken up events of samples, their replay timestamps and streamSample offsets are saved in, so they are reused until the sample file changes.
+    * It must be owned by the user running eventgen and have mode 0700, otherwise nothing is saved.
+    * Defaults to none, samples are parsed again every time eventgen starts.
+
 threading = thread | process
     * Configurable threading model.  Process uses multiprocessing.Process in Python to get around issues with the GIL.
     * Defaults to thread
@@ -269,6 +281,7 @@ splitSample = <integer>
     * default value set to 0
     * Value of 1 will default to number of threads / processes enabled
     * some generators may not have the ability split threads and guarantee transaction order.
+    * the jinja generator gives each worker its own range of eventgen_count instead of a share of count.
 
 sampletype = raw | csv
     * Raw are raw events (default)
@@ -298,6 +311,24 @@ timeMultiple = <float>
       to play out over 20 minutes with a timeMultiple of 2, or 60 minutes with a timeMultiple of 6.
       By the converse, make timeMultiple 0.5 will make the events run twice as fast.
 
+replayTick = <float>
+    * Only valid in mode = replay
+    * Events due within replayTick seconds of each other, or overdue, are sent together in one batch.
+    * Defaults to 0.01.
+
+replayPartition = _raw | host | source | sourcetype | index
+    * Only valid in mode = replay
+    * Replays the sample as independent timelines, one per value of this field, on up to generatorWorkers
+      generator workers at the same time.
+    * The sample's own generator worker replays one of the timelines and every other one needs a free generator
+      worker of its own, so partitions queued behind other samples' generators start late.
+    * Partitions still running 60 seconds after the end of the sample's timeline are no longer waited for.
+    * Defaults to none.
+
+replayPartitionRegex = <regex>
+    * Only valid with replayPartition
+    * Partitions by the first group of the regex in the replayPartition field, or all of the match.
+
 timeField = <field name>
     * Only valid in mode = replay
     * Will select the field to find the timestamp in.  In many cases, time will come from a different
@@ -399,6 +430,15 @@ breaker = <regular expression>
     * If breaker does not match in sample, one iteration of sample will be generated.
     * Defaults to [^\r\n\s]+
 
+streamSample = <boolean>
+    * Index the events of a raw sample instead of reading the whole sample file into memory. Events are read
+      from the memory mapped file as they are generated, and only their offsets are kept, so very large
+      samples can be used with bounded memory.
+    * The offsets are saved in sampleCacheDir, if set, and reused until the sample file changes.
+    * A non-default breaker is matched against the file's bytes rather than its decoded text.
+    * Only supported with sampletype = raw and generator = default or generator = replay.
+    * Defaults to false.
+
 earliest = <time-str>
     * Specifies the earliest random time for generated events.
     * If this value is an absolute time, use the dispatch.time_format to format the value.
@@ -426,6 +466,16 @@ jinja_target_template = <str>
 jinja_variables = <json>
     * json value that contains a dict of kv pairs to pass as options to load inside of the jinja templating engine.
 
+jinja_bytecode_cache = true | false
+    * Compiled templates are kept between intervals and compiled again when the template file changes.
+    * When true, compiled templates are also saved to disk, so worker processes and restarts of eventgen don't compile them again.
+    * Defaults to false.
+
+jinja_bytecode_cache_dir = <dir>
+    * Directory compiled templates are saved in with jinja_bytecode_cache.
+    * It must be owned by the user running eventgen and have mode 0700, otherwise compiled templates are not saved.
+    * Defaults to Jinja's own cache directory for the current user.
+
 ################################
 ## TOKEN REPLACEMENT SETTINGS ##
 ################################
@@ -436,7 +486,7 @@ token.<n>.token = <regular expression>
     * If one or more capture groups are present the replacement will be performed on group 1.
     * Defaults to None.
 
-token.<n>.replacementType = static | timestamp | replaytimestamp | random | rated | file | mvfile | integerid
+token.<n>.replacementType = static | timestamp | replaytimestamp | random | rated | file | mvfile | weightedfile | integerid
     * 'n' is a number starting at 0, and increasing by 1. Stop looking at the filter when 'n' breaks.
     * For static, the token will be replaced with the value specified in the replacement setting.
     * For timestamp, the token will be replaced with the strptime specified in the replacement setting
@@ -453,6 +503,7 @@ token.<n>.replacementType = static | timestamp | replaytimestamp | random | rate
       rated by hourOfDayRate and dayOfWeekRate.
     * For file, the token will be replaced with a random value retrieved from a file specified in the replacement setting.
     * For mvfile, the token will be replaced with a random value of a column retrieved from a file specified in the replacement setting.  Multiple files can reference the same source file and receive different columns from the same random line.
+    * For weightedfile, the token will be replaced with (a column of) a line picked from a CSV file, where the last column of every line is its weight.  A line with weight 10 is picked ten times as often as a line with weight 1.  The weight column is never part of the replacement.
     * For integerid, will use an incrementing integer as the replacement.
     * Defaults to None.
 
@@ -1,7 +1,7 @@
 import os
 import sys
 
-from mock import patch
+from mock import MagicMock, patch
 
 from splunk_eventgen.__main__ import parse_args
 from splunk_eventgen.eventgen_core import EventGenerator
@@ -49,3 +49,68 @@ class TestJinjaGenerator(object):
         # tear down
         if os.path.isfile(file_output_path):
             os.remove(file_output_path)
+
+    def test_jinja_environment_cached(self, tmp_path):
+        from splunk_eventgen.lib.plugins.generator import jinja
+
+        template = tmp_path / "test.template"
+        template.write_text("{{ 1 }}")
+        env = jinja.get_environment(str(tmp_path))
+        assert jinja.get_environment(str(tmp_path)) is env
+        compiled = env.get_template("test.template")
+        assert env.get_template("test.template") is compiled
+        # A changed template is compiled again
+        template.write_text("{{ 2 }}")
+        os.utime(str(template), (0, 0))
+        assert env.get_template("test.template").render() == "2"
+        jinja.clear_environments()
+        assert jinja.get_environment(str(tmp_path)) is not env
+
+    def test_jinja_bytecode_cache_dir(self, tmp_path):
+        from jinja2 import FileSystemBytecodeCache
+
+        from splunk_eventgen.lib.plugins.generator import jinja
+
+        cacheDir = tmp_path / "bytecode"
+        assert isinstance(
+            jinja.get_bytecode_cache(str(cacheDir)), FileSystemBytecodeCache
+        )
+        assert oct(cacheDir.stat().st_mode & 0o777) == oct(0o700)
+        # A directory other users can write to is never loaded from
+        cacheDir.chmod(0o777)
+        assert jinja.get_bytecode_cache(str(cacheDir)) is None
+
+    def test_jinja_emit(self):
+        from splunk_eventgen.lib.plugins.generator import jinja
+
+        sample = type("Sample", (), {})()
+        sample.host = "host1"
+        sample.hostRegex = None
+        sample.source = "source1"
+        sample.sourcetype = "sourcetype1"
+        sample.index = "main"
+        generator = jinja.JinjaGenerator.__new__(jinja.JinjaGenerator)
+        generator._sample = sample
+        lines_out = []
+        emit = generator._make_emit(lines_out)
+        assert emit({"_time": 1, "_raw": "a\nb"}) == ""
+        emit(_time=2, _raw='"c"', host="host2")
+        assert [line["_raw"] for line in lines_out] == ["a\nb", '"c"']
+        assert [line["host"] for line in lines_out] == ["host1", "host2"]
+        assert lines_out[0]["index"] == "main"
+
+    def test_jinja_split_count(self):
+        from splunk_eventgen.lib.plugins.generator import jinja
+
+        generator = jinja.JinjaGenerator(MagicMock())
+        generator.updateCounts(count=10, start_time=None, end_time=None)
+        generator.config = generator.outputQueue = None
+        assert generator.splitCount(1) == [generator]
+        with patch.object(jinja.JinjaGenerator, "updateConfig"):
+            runs = generator.splitCount(3)
+        # Every run renders its own eventgen_count range, sliced by the whole count
+        assert [run.countRange for run in runs] == [(0, 3), (3, 6), (6, 10)]
+        assert [run.count for run in runs] == [10, 10, 10]
+        generator.updateCounts(count=2, start_time=None, end_time=None)
+        with patch.object(jinja.JinjaGenerator, "updateConfig"):
+            assert len(generator.splitCount(4)) == 2
@@ -0,0 +1,109 @@
+"""
+Benchmark of breaking a sample up into events with a custom breaker, on a generated sample of multi-line Java stack
+traces.  Compares the search() loop Sample.processSampleLine() used to run with the single finditer() pass it runs
+now, re.split() with the breaker as a capture group, and indexing the file for streamSample.
+
+    python tests/perf/benchmark_breaker.py --events 500000
+"""
+
+import argparse
+import logging
+import os
+import random
+import re
+import tempfile
+import time
+
+from splunk_eventgen.lib import eventgensampleindex
+from splunk_eventgen.lib.eventgensampleindex import SampleIndex, breaker_bounds
+
+BREAKER = r"^\d{4}-\d{2}-\d{2}"
+
+logger = logging.getLogger("benchmark_breaker")
+
+
+def make_sample(events):
+    rng = random.Random(0)
+    parts = []
+    for i in range(events):
+        parts.append(
+            "2020-01-01 12:00:%02d ERROR Request %d failed\njava.lang.IllegalStateException: oops\n"
+            % (i % 60, i)
+        )
+        for frame in range(rng.randint(0, 20)):
+            parts.append(
+                "\tat com.example.Service.call%d(Service.java:%d)\n"
+                % (frame, frame * 10)
+            )
+    return "".join(parts)
+
+
+def search_loop(data, breakerRE):
+    """The loop processSampleLine() used to run, debug logging included"""
+    lines = []
+    extractpos = 0
+    searchpos = 0
+    breakerMatch = breakerRE.search(data, searchpos)
+    while breakerMatch:
+        logger.debug(
+            "Breaker found at: %d, %d"
+            % (breakerMatch.span()[0], breakerMatch.span()[1])
+        )
+        if breakerMatch.span()[0] != 0:
+            lines.append(data[extractpos : breakerMatch.span()[0]])
+            extractpos = breakerMatch.span()[0]
+        searchpos = breakerMatch.span()[1]
+        breakerMatch = breakerRE.search(data, searchpos)
+    lines.append(data[extractpos:])
+    return lines
+
+
+def finditer_pass(data, breakerRE):
+    bounds = breaker_bounds(data, breakerRE)
+    return [data[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def split_pass(data, breakerRE):
+    splitRE = re.compile("(%s)" % breakerRE.pattern, breakerRE.flags)
+    parts = splitRE.split(data)
+    # Every match is followed by the breaker's own groups and then the text up to the next match
+    stride = splitRE.groups + 1
+    lines = [parts[0]] if parts[0] else []
+    for i in range(1, len(parts), stride):
+        lines.append(parts[i] + parts[i + stride - 1])
+    return lines
+
+
+def timed(name, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    print("%-28s %8.3fs" % (name, time.perf_counter() - start))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=200000)
+    args = parser.parse_args()
+
+    data = make_sample(args.events)
+    print("%d events, %.1f MB" % (args.events, len(data) / 1e6))
+    breakerRE = re.compile(BREAKER, re.M)
+    expected = timed("search() loop", search_loop, data, breakerRE)
+    assert timed("finditer() pass", finditer_pass, data, breakerRE) == expected
+    assert timed("re.split()", split_pass, data, breakerRE) == expected
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sample.log")
+        with open(path, "w") as f:
+            f.write(data)
+        cacheDir = os.path.join(directory, "cache")
+        index = timed("streamSample index", SampleIndex, path, BREAKER, None, cacheDir)
+        eventgensampleindex.clear_sample_indexes()
+        timed("streamSample saved index", SampleIndex, path, BREAKER, None, cacheDir)
+        assert len(index) == len(expected)
+        eventgensampleindex.clear_sample_indexes()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark of parsing and formatting timestamps with the formats compiled by eventgentimeformat, against
+datetime.strptime() and datetime.strftime() which getTSFromEvent() and the timestamp tokens used to call.
+
+    python tests/perf/benchmark_timeformat.py --timestamps 200000
+"""
+import argparse
+import datetime
+import random
+import time
+
+from splunk_eventgen.lib.eventgentimeformat import strftime, strptime
+
+FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%d/%m/%y %H%M%S",
+    # Not compiled, measures the cost of falling back
+    "%d/%b/%Y:%H:%M:%S",
+]
+
+
+def make_timestamps(count):
+    rng = random.Random(0)
+    start = datetime.datetime(2020, 1, 1)
+    return [
+        start
+        + datetime.timedelta(
+            seconds=rng.randint(0, 86400 * 365), microseconds=rng.randint(0, 999999)
+        )
+        for _ in range(count)
+    ]
+
+
+def timed(name, function, values, fmt):
+    start = time.perf_counter()
+    result = [function(value, fmt) for value in values]
+    elapsed = time.perf_counter() - start
+    print("%-28s %8.3fs %8.2fus each" % (name, elapsed, elapsed * 1e6 / len(values)))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--timestamps", type=int, default=100000)
+    args = parser.parse_args()
+
+    timestamps = make_timestamps(args.timestamps)
+    for fmt in FORMATS:
+        print("%d timestamps, format '%s'" % (args.timestamps, fmt))
+        strings = timed(
+            "datetime.strftime()", datetime.datetime.strftime, timestamps, fmt
+        )
+        assert timed("compiled strftime()", strftime, timestamps, fmt) == strings
+        parsed = timed("datetime.strptime()", datetime.datetime.strptime, strings, fmt)
+        assert timed("compiled strptime()", strptime, strings, fmt) == parsed
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
 from os import path as op
+from types import SimpleNamespace
 
 import pytest
 
+from splunk_eventgen.lib import eventgensampleindex
 from splunk_eventgen.lib.eventgenconfig import Config
+from splunk_eventgen.lib.eventgensamples import Sample
+from splunk_eventgen.lib.eventgentoken import Token
+
+# Breaker of the default eventgen.conf
+DEFAULT_BREAKER = r"[^\r\n\s]+"
 
 
 @pytest.fixture
@@ -20,3 +27,57 @@ def eventgen_config():
         return Config(configfile=configfile)
 
     return _make_eventgen_config_instance
+
+
+@pytest.fixture
+def make_token():
+    """Returns a function to create a token from its regex, replacement type and replacement"""
+
+    def _make_token(token, replacementType, replacement):
+        t = Token()
+        t.token = token
+        t.replacementType = replacementType
+        t.replacement = replacement
+        return t
+
+    return _make_token
+
+
+@pytest.fixture
+def make_sample():
+    """
+    Returns a function to create a raw sample of the file at path, named after it if no name is given, with the
+    default breaker and any other settings passed
+    """
+
+    def _make_sample(path=None, name=None, **settings):
+        if name is None:
+            name = op.splitext(op.basename(str(path)))[0] if path else "sample"
+        sample = Sample(name)
+        sample.config = SimpleNamespace(breaker=DEFAULT_BREAKER)
+        sample.filePath = None if path is None else str(path)
+        sample.sampletype = "raw"
+        sample.breaker = DEFAULT_BREAKER
+        sample.index = "main"
+        sample.host = "web01"
+        sample.source = op.basename(str(path)) if path else name
+        sample.sourcetype = name
+        for setting, value in settings.items():
+            setattr(sample, setting, value)
+        return sample
+
+    return _make_sample
+
+
+@pytest.fixture(autouse=True)
+def clear_sample_indexes():
+    """Forgets the sample files mapped by earlier tests"""
+    eventgensampleindex.clear_sample_indexes()
+    yield
+    eventgensampleindex.clear_sample_indexes()
+
+
+@pytest.fixture
+def sample_cache_dir(tmp_path):
+    """Returns a sampleCacheDir for the parsed samples and sample indexes written by a test"""
+    return str(tmp_path / "cache")
@@ -0,0 +1,126 @@
+from types import SimpleNamespace
+
+import pytest
+
+from splunk_eventgen import eventgen_core
+from splunk_eventgen.eventgen_core import EventGenerator
+
+# Global settings the worker pools of the running eventgen were built with
+POOL_SETTINGS = {"generatorWorkers": 1, "disableLoggingQueue": False}
+
+# Settings of every sample, their signature is made of interval and count
+SAMPLE_SETTINGS = {
+    "app": "app",
+    "interval": 60,
+    "mode": "sample",
+    "end": "0",
+    "count": 1,
+    "config": SimpleNamespace(_validSettings=["interval", "count"]),
+}
+
+
+class _Config(object):
+    """Stands in for Config, parse() reads the settings and samples in parsed"""
+
+    parsed = {}
+
+    def __init__(self, configfile, threading="thread"):
+        self.configfile = configfile
+        self.threading = threading
+
+    def parse(self):
+        for name, value in self.parsed.items():
+            setattr(self, name, value)
+
+
+class _Timer(object):
+    def __init__(self, sample):
+        self.sample = sample
+        self.stopping = False
+
+
+@pytest.fixture
+def eventgen(monkeypatch, make_sample):
+    """A running EventGenerator whose timers are stubs, started for samples "unchanged", "changed" and "removed" """
+    monkeypatch.setattr(eventgen_core, "Config", _Config)
+    monkeypatch.setattr(_Config, "parsed", {})
+    eventgen = EventGenerator.__new__(EventGenerator)
+    eventgen.args = SimpleNamespace(multiprocess=False, generators=None)
+    eventgen.logger = eventgen_core.logger
+    eventgen.timers = {}
+    eventgen.started_samples = []
+
+    def start_timer(s):
+        eventgen.started_samples.append(s)
+        eventgen.timers[eventgen._sample_key(s)] = (_Timer(s), s.getSettingsSignature())
+
+    eventgen._start_timer = start_timer
+    eventgen.config = SimpleNamespace(**POOL_SETTINGS)
+    for name in ("unchanged", "changed", "removed"):
+        start_timer(make_sample(name=name, **SAMPLE_SETTINGS))
+    eventgen.started_samples = []
+    return eventgen
+
+
+def _timer(eventgen, name):
+    return eventgen.timers[("app", name, None)][0]
+
+
+def test_reload_samples(eventgen, make_sample):
+    """Test only the timers of changed and removed samples are stopped, and changed and new samples started"""
+    unchanged = _timer(eventgen, "unchanged")
+    changed = _timer(eventgen, "changed")
+    removed = _timer(eventgen, "removed")
+    newChanged = make_sample(name="changed", **dict(SAMPLE_SETTINGS, count=2))
+    added = make_sample(name="added", **SAMPLE_SETTINGS)
+    idle = make_sample(name="idle", **dict(SAMPLE_SETTINGS, interval=0))
+    _Config.parsed = dict(
+        POOL_SETTINGS,
+        samples=[
+            make_sample(name="unchanged", **SAMPLE_SETTINGS),
+            newChanged,
+            added,
+            idle,
+        ],
+    )
+    assert eventgen._reload_samples("eventgen.conf")
+    assert not unchanged.stopping
+    assert changed.stopping
+    assert removed.stopping
+    assert eventgen.started_samples == [newChanged, added]
+    # The running sample is kept, not the one parsed again
+    assert eventgen.config.samples == [unchanged.sample, newChanged, added, idle]
+    assert sorted(name for _, name, _ in eventgen.timers) == [
+        "added",
+        "changed",
+        "unchanged",
+    ]
+    assert _timer(eventgen, "unchanged") is unchanged
+
+
+@pytest.mark.parametrize(
+    "settings,multiprocess",
+    [
+        # The worker pools were built for other settings
+        ({"generatorWorkers": 4}, False),
+        ({"disableLoggingQueue": True}, False),
+        ({"threading": "process"}, False),
+        # Worker processes can't share the counter of the changed sample's integerid token
+        ({}, True),
+    ],
+)
+def test_reload_samples_full(eventgen, make_sample, make_token, settings, multiprocess):
+    """Test a full reload is asked for, without stopping or starting any timer, when the worker pools must change"""
+    eventgen.args.multiprocess = multiprocess
+    timers = dict(eventgen.timers)
+    changed = make_sample(name="changed", **dict(SAMPLE_SETTINGS, count=2))
+    changed.tokens = [make_token(r"id=(\d+)", "integerid", "0")]
+    _Config.parsed = dict(
+        POOL_SETTINGS,
+        samples=[make_sample(name="unchanged", **SAMPLE_SETTINGS), changed],
+        **settings,
+    )
+    assert not eventgen._reload_samples("eventgen.conf")
+    assert eventgen.timers == timers
+    assert not any(timer.stopping for timer, _ in timers.values())
+    assert eventgen.started_samples == []
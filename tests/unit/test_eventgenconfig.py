@@ -393,3 +393,15 @@ def test_parse(eventgen_config):
     config_instance = eventgen_config(configfile="eventgen.conf.config")
     config_instance.parse()
     assert len(config_instance.samples) == 1
+
+
+def test_settings_signature(eventgen_config):
+    """Test samples parsed again from the same config have the same signature, and a changed setting doesn't"""
+    config_instance = eventgen_config(configfile="eventgen.conf.config")
+    config_instance.parse()
+    signature = config_instance.samples[0].getSettingsSignature()
+    config_instance.parse()
+    sample = config_instance.samples[0]
+    assert sample.getSettingsSignature() == signature
+    sample.count += 1
+    assert sample.getSettingsSignature() != signature
@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+import pickle
+import threading
+
+from splunk_eventgen.lib.eventgencounter import (
+    BlockCounter,
+    install_shared_counters,
+    shared_counters,
+)
+
+
+def _draw(counter, count, results):
+    results.extend(counter.next() for _ in range(count))
+
+
+def _draw_in_process(counter, counters, count, queue):
+    install_shared_counters(counters)
+    queue.put([counter.next() for _ in range(count)])
+
+
+def test_counter_threads_unique():
+    """Test threads drawing from one counter never get the same value"""
+    counter = BlockCounter(100, blockSize=10)
+    results = []
+    threads = [
+        threading.Thread(target=_draw, args=(counter, 250, results)) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(results)) == 1000
+    assert min(results) == 100
+    assert counter.value == 1100
+
+
+def test_counter_sequential_single_thread():
+    """Test a single thread gets consecutive values across blocks"""
+    counter = BlockCounter(5, blockSize=3)
+    assert [counter.next() for _ in range(7)] == list(range(5, 12))
+
+
+def test_counter_shared_processes():
+    """Test pickled copies of a shared counter in other processes draw disjoint values"""
+    counter = BlockCounter(0, blockSize=5)
+    counter.share()
+    queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=_draw_in_process,
+            args=(pickle.loads(pickle.dumps(counter)), shared_counters(), 20, queue),
+        )
+        for _ in range(3)
+    ]
+    for process in processes:
+        process.start()
+    results = [value for _ in processes for value in queue.get(timeout=30)]
+    for process in processes:
+        process.join()
+    assert sorted(results) == list(range(60))
+    assert counter.value == 60
+
+
+def test_counter_state_file(tmp_path):
+    """Test the state file holds the end of the last allocated block"""
+    stateFile = str(tmp_path / "state.id")
+    counter = BlockCounter(10, blockSize=100, stateFile=stateFile)
+    assert counter.next() == 10
+    with open(stateFile) as f:
+        assert f.read() == "110"
+
+
+def test_counter_reserve():
+    """Test reserved values are used before a new block is allocated"""
+    counter = BlockCounter(0, blockSize=10)
+    counter.reserve(3)
+    assert counter.value == 3
+    assert [counter.next() for _ in range(4)] == [0, 1, 2, 3]
+    assert counter.value == 13
+
+
+def test_sample_state_file(tmp_path):
+    """Test integerid state is only saved in stateDir, and never next to the samples"""
+    from splunk_eventgen.lib.eventgensamples import Sample
+    from splunk_eventgen.lib.eventgentoken import Token
+
+    sample = Sample("sample.log")
+    sample.sampleDir = str(tmp_path / "samples")
+    token = Token()
+    token.token = r"id=(\d+)"
+    token.replacementType = "integerid"
+    assert sample.getStateFile(token) is None
+
+    sample.stateDir = str(tmp_path / "state")
+    stateFile = sample.getStateFile(token)
+    assert os.path.dirname(stateFile) == sample.stateDir
+    assert os.path.basename(stateFile) == "sample.log.state.id%3D%28%5Cd%2B%29"
+    assert sample.getLegacyStateFile(token) == os.path.join(
+        sample.sampleDir, "state.id%3D%28%5Cd%2B%29"
+    )
+
+
+def test_sample_save_state(tmp_path):
+    """Test the next value of every integerid counter is saved when the sample stops"""
+    from splunk_eventgen.lib.eventgensamples import Sample
+    from splunk_eventgen.lib.eventgentoken import Token
+
+    sample = Sample("sample.log")
+    sample.stateDir = str(tmp_path)
+    token = Token()
+    token.token = r"id=(\d+)"
+    token.replacementType = "integerid"
+    token.replacement = "10"
+    sample.tokens = [token]
+    counter = token.get_counter()
+    counter.next()
+    sample.saveState()
+    with open(sample.getStateFile(token)) as f:
+        assert int(f.read()) == counter.value
@@ -0,0 +1,75 @@
+import collections
+import random
+
+from splunk_eventgen.lib.eventgenfile import (
+    AliasTable,
+    get_replacement_file,
+    private_directory,
+)
+
+
+def test_replacement_file_lines(tmp_path):
+    """Test lines are served like readlines() with whitespace stripped"""
+    path = tmp_path / "users.csv"
+    path.write_text("alice,10\r\nbob,20\n\ncarol,30")
+    replacementFile = get_replacement_file(str(path))
+    assert len(replacementFile) == 4
+    assert [replacementFile.line(i) for i in range(4)] == [
+        "alice,10",
+        "bob,20",
+        "",
+        "carol,30",
+    ]
+    assert replacementFile.columns(1) == ["bob", "20"]
+    assert replacementFile.columns(1) is replacementFile.columns(1)
+
+
+def test_replacement_file_shared(tmp_path):
+    """Test every lookup of the same file returns the same mapping"""
+    path = tmp_path / "hosts.txt"
+    path.write_text("web01\nweb02\n")
+    replacementFile = get_replacement_file(str(path))
+    assert len(replacementFile) == 2
+    assert get_replacement_file(str(tmp_path / "." / "hosts.txt")) is replacementFile
+
+
+def test_replacement_file_missing(tmp_path):
+    """Test missing and empty files are not replaced"""
+    assert get_replacement_file(str(tmp_path / "missing.txt")) is None
+    path = tmp_path / "empty.txt"
+    path.write_text("")
+    assert get_replacement_file(str(path)) is None
+
+
+def test_alias_table_weights():
+    """Test alias table picks follow the weights and never pick zero weights"""
+    random.seed(7)
+    table = AliasTable([0, 1, 3, 0, 6])
+    counts = collections.Counter(table.pick() for _ in range(20000))
+    assert set(counts) == {1, 2, 4}
+    assert abs(counts[4] / 20000.0 - 0.6) < 0.02
+    assert abs(counts[2] / 20000.0 - 0.3) < 0.02
+
+
+def test_replacement_file_weighted(tmp_path):
+    """Test weightedfile lines use their last column as weight"""
+    path = tmp_path / "urls.csv"
+    path.write_text("/index.html,GET,9\n/admin,POST,1\n/broken,GET,abc\n")
+    replacementFile = get_replacement_file(str(path))
+    table = replacementFile.alias_table()
+    assert table is replacementFile.alias_table()
+    assert 2 not in set(table.pick() for _ in range(1000))
+
+
+def test_private_directory(tmp_path):
+    """Test directories are created private, and ones others can write to are refused"""
+    path = tmp_path / "cache"
+    assert private_directory(str(path))
+    assert path.stat().st_mode & 0o777 == 0o700
+    path.chmod(0o755)
+    assert not private_directory(str(path))
+    target = tmp_path / "target"
+    target.mkdir(mode=0o700)
+    link = tmp_path / "link"
+    link.symlink_to(target)
+    assert not private_directory(str(link))
@@ -0,0 +1,227 @@
+import copy
+import datetime
+import random
+
+import pytest
+
+from splunk_eventgen.lib.eventgenfile import clear_replacement_files
+from splunk_eventgen.lib.eventgenplan import ReplacementPlan, literal_prefix
+from splunk_eventgen.lib.eventgensamples import Sample
+
+
+def _sequential(tokens, raw, **kwargs):
+    for token in tokens:
+        raw = token.replace(raw, **kwargs)
+    return raw
+
+
+plan_test_params = [
+    (
+        [
+            (r"user=(\w+)", "static", "admin"),
+            (r"bytes=(\d+)", "random", "integer[1:1000]"),
+            (r"src=(\S+)", "random", "ipv4"),
+        ],
+        "user=bob bytes=12 src=10.0.0.1 dst=10.0.0.2 user=alice\n",
+    ),
+    (
+        [
+            (r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}", "timestamp", "%Y-%m-%d %H:%M:%S"),
+            (r"status=(\d+)", "random", 'list["200","404"]'),
+        ],
+        "2020-01-01 00:00:00 status=500 no token here\n",
+    ),
+]
+
+
+@pytest.mark.parametrize("tokens,raw", plan_test_params)
+def test_plan_matches_sequential(make_token, tokens, raw):
+    """Test a planned line renders exactly like the sequential token loop"""
+    tokens = [make_token(*token) for token in tokens]
+    now = datetime.datetime(2021, 1, 2, 3, 4, 5)
+    sample = Sample("plan")
+    sample.earliest = sample.latest = "now"
+    kwargs = {"et": now, "lt": now, "s": sample, "pivot_timestamp": now}
+    plan = ReplacementPlan(tokens, [raw])
+    line_plan = plan.get(raw)
+    assert line_plan is not None
+
+    # Copies so both runs start without buffered random values
+    random.seed(42)
+    expect = _sequential(copy.deepcopy(tokens), raw, **kwargs)
+    random.seed(42)
+    assert line_plan.render(copy.deepcopy(plan.tokens), **kwargs) == expect
+
+
+def test_plan_overlapping_tokens(make_token):
+    """Test lines where two tokens match the same text fall back to sequential replacement"""
+    tokens = [
+        make_token(r"ip=(\d+\.\d+\.\d+\.\d+)", "static", "1.1.1.1"),
+        make_token(r"(\d+)\.", "static", "9."),
+    ]
+    plan = ReplacementPlan(tokens, ["ip=10.0.0.1\n"])
+    assert plan.get("ip=10.0.0.1\n") is None
+
+
+def test_plan_chained_static_tokens(make_token):
+    """Test a token matching an earlier static replacement disables the plan"""
+    tokens = [
+        make_token(r"@@user@@", "static", "@@name@@"),
+        make_token(r"@@name@@", "static", "admin"),
+    ]
+    plan = ReplacementPlan(tokens, ["user=@@user@@\n"])
+    assert not plan.enabled
+    assert plan.get("user=@@user@@\n") is None
+
+
+def test_plan_chained_dynamic_tokens(make_token):
+    """Test a token matching the output of an earlier dynamic token is run on the replaced line"""
+    tokens = [
+        make_token(r"@@user@@", "random", 'list["@@name@@"]'),
+        make_token(r"@@name@@", "static", "admin"),
+    ]
+    raw = "user=@@user@@\n"
+    plan = ReplacementPlan(tokens, [raw])
+    assert plan.get(raw) is None
+    assert plan.applicable(raw) == tokens
+    assert _sequential(plan.applicable(raw), raw) == "user=admin\n"
+
+
+def test_plan_chained_baked_line(make_token):
+    """Test a later token matching across a static replacement and the text around it is run on the replaced line"""
+    raw = "user=@@u@@\n"
+    for tokens, expect in (
+        (
+            [
+                make_token(r"@@u@@", "static", "bob"),
+                make_token(r"user=(\w+)", "random", 'list["x"]'),
+            ],
+            "user=x\n",
+        ),
+        (
+            [
+                make_token(r"@@u@@", "static", "bob"),
+                make_token(r"user=bob", "static", "alice"),
+            ],
+            "alice\n",
+        ),
+    ):
+        plan = ReplacementPlan(tokens, [raw])
+        assert plan.get(raw) is None
+        assert plan.applicable(raw) == tokens
+        assert _sequential(plan.applicable(raw), raw) == expect
+
+
+def test_plan_chained_unanchored_tokens(make_token):
+    """Test lines fall back when a later token doesn't start with literal text or could start before a dynamic value"""
+    raw = "id=1 n=2\n"
+    unanchored = [
+        make_token(r"id=(\d+)", "random", "integer[5:5]"),
+        make_token(r"(\d+)", "static", "0"),
+    ]
+    assert ReplacementPlan(unanchored, [raw]).get(raw) is None
+    completed = [
+        make_token(r"@@value@@", "random", "integer[5:5]"),
+        make_token(r"n=(\d+)", "static", "0"),
+    ]
+    assert ReplacementPlan(completed, ["n=@@value@@\n"]).get("n=@@value@@\n") is None
+    anchored = [
+        make_token(r"id=(\d+)", "random", "integer[5:5]"),
+        make_token(r"n=(\d+)", "static", "0"),
+    ]
+    assert ReplacementPlan(anchored, [raw]).get(raw).render(anchored) == "id=5 n=0\n"
+
+
+def test_plan_chained_file_tokens(make_token, tmp_path):
+    """Test replacement files are searched for the text a later token starts with"""
+    path = tmp_path / "names.txt"
+    sample = Sample("plan")
+    sample.config = type("Config", (), {"grandparentdir": str(tmp_path)})()
+    raw = "user=bob n=1\n"
+    for contents, planned in (("alice\nbob\n", True), ("alice\nn=carol\n", False)):
+        path.write_text(contents)
+        tokens = [
+            make_token(r"user=(\w+)", "file", str(path)),
+            make_token(r"n=(\d+)", "static", "0"),
+        ]
+        clear_replacement_files()
+        plan = ReplacementPlan(tokens, [raw], sample=sample)
+        assert (plan.get(raw) is not None) == planned
+
+
+def test_plan_bakes_static_tokens(make_token):
+    """Test static replacements are baked into the line and never called per event"""
+    static = make_token(r"user=(\w+)", "static", "admin")
+    dynamic = make_token(r"id=(\d+)", "random", "integer[7:7]")
+    plan = ReplacementPlan([static, dynamic], ["user=bob id=1\n", "user=bob\n"])
+    line_plan = plan.get("user=bob id=1\n")
+    assert line_plan.slots == [1]
+    assert line_plan.render(plan.tokens) == "user=admin id=7\n"
+    static_plan = plan.get("user=bob\n")
+    assert static_plan.slots == []
+    assert static_plan.render(plan.tokens) == "user=admin\n"
+
+
+baked_overlap_params = [
+    # Static output completing a match of a later token
+    (
+        [(r"@@n@@", "static", "1"), (r"id=(\d+)", "random", "integer[5:5]")],
+        "id=@@n@@7\n",
+    ),
+    # Static output adding a second match of a later token
+    (
+        [(r"@@x@@", "static", "=2"), (r"n=(\d)", "random", "integer[9:9]")],
+        "n=1 n@@x@@\n",
+    ),
+    # Static output matched by a later static token
+    ([(r"@@u@@", "static", "bob"), (r"=bob", "static", "=alice")], "user=@@u@@\n"),
+    # Static output next to, but not part of, a later match
+    (
+        [(r"@@u@@", "static", "bob"), (r"id=(\d+)", "random", "integer[5:5]")],
+        "@@u@@ id=1\n",
+    ),
+]
+
+
+@pytest.mark.parametrize("tokens,raw", baked_overlap_params)
+def test_plan_baked_overlap(make_token, tokens, raw):
+    """Test lines with static output baked in render like the sequential token loop"""
+    tokens = [make_token(*token) for token in tokens]
+    plan = ReplacementPlan(tokens, [raw])
+    line_plan = plan.get(raw)
+    if line_plan is None:
+        rendered = _sequential(plan.applicable(raw), raw)
+    else:
+        rendered = line_plan.render(plan.tokens)
+    assert rendered == _sequential(tokens, raw)
+
+
+def test_plan_applicable_tokens(make_token):
+    """Test the sequential loop only gets the tokens which can match a line"""
+    tokens = [
+        make_token(r"user=(\w+)", "static", "admin"),
+        make_token(r"admin", "static", "root"),
+        make_token(r"bytes=(\d+)", "random", "integer[1:10]"),
+        make_token(r"src=(\S+)", "random", "ipv4"),
+    ]
+    plan = ReplacementPlan(tokens)
+    assert plan.applicable("user=bob\n") == tokens[:2]
+    assert plan.applicable("src=1.1.1.1\n") == tokens[3:]
+    assert plan.applicable("bytes=5 other\n") == tokens[2:]
+    assert plan.applicable("nothing\n") == []
+
+
+literal_prefix_params = [
+    (r"user=(\w+)", "user="),
+    (r"\"id\":\s(\d+)", '"id":'),
+    (r"ab?c", "a"),
+    (r"(\d+)", ""),
+    (r"a|b", ""),
+    (r"^host=", ""),
+]
+
+
+@pytest.mark.parametrize("pattern,prefix", literal_prefix_params)
+def test_literal_prefix(pattern, prefix):
+    """Test the literal text a token pattern starts with is found"""
+    assert literal_prefix(pattern) == prefix
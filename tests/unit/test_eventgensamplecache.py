@@ -0,0 +1,70 @@
+import datetime
+import os
+from array import array
+
+from splunk_eventgen.lib.eventgensamplecache import (
+    MISSING_TIME,
+    load_events,
+    load_times,
+    save_events,
+    save_times,
+    to_datetime,
+    to_micros,
+)
+
+
+def test_sample_cache_events(tmp_path, sample_cache_dir):
+    """Test broken up events are read back for the same file and key only"""
+    path = tmp_path / "sample.log"
+    path.write_text("one\ntwo\n")
+    events = ["one\n", "été \udcff\n", ""]
+    assert load_events(str(path), ("raw", "\\n"), sample_cache_dir) is None
+    save_events(str(path), ("raw", "\\n"), events, sample_cache_dir)
+    assert load_events(str(path), ("raw", "\\n"), sample_cache_dir) == events
+    assert load_events(str(path), ("raw", "x"), sample_cache_dir) is None
+
+
+def test_sample_cache_changed_file(tmp_path, sample_cache_dir):
+    """Test a changed file misses the cache and replaces the old cache file"""
+    path = tmp_path / "sample.log"
+    path.write_text("one\n")
+    save_events(str(path), ("raw",), ["one\n"], sample_cache_dir)
+    path.write_text("one\ntwo\n")
+    assert load_events(str(path), ("raw",), sample_cache_dir) is None
+    save_events(str(path), ("raw",), ["one\n", "two\n"], sample_cache_dir)
+    assert load_events(str(path), ("raw",), sample_cache_dir) == ["one\n", "two\n"]
+    assert len(os.listdir(os.path.join(sample_cache_dir, "samples"))) == 1
+
+
+def test_sample_cache_disabled(tmp_path, sample_cache_dir):
+    """Test nothing is cached without sampleCacheDir, or in a directory other users can write to"""
+    path = tmp_path / "sample.log"
+    path.write_text("one\n")
+    save_events(str(path), ("raw",), ["one\n"])
+    assert load_events(str(path), ("raw",)) is None
+    save_events(str(path), ("raw",), ["one\n"], sample_cache_dir)
+    os.chmod(os.path.join(sample_cache_dir, "samples"), 0o777)
+    assert load_events(str(path), ("raw",), sample_cache_dir) is None
+
+
+def test_sample_cache_times(tmp_path, sample_cache_dir):
+    """Test base times survive the cache to the microsecond, including missing ones"""
+    path = tmp_path / "sample.log"
+    path.write_text("one\n")
+    timestamps = [
+        datetime.datetime(2014, 1, 4, 20, 0, 0, 123456),
+        None,
+        datetime.datetime(1960, 5, 1),
+        datetime.datetime(2014, 1, 4, 20, 0, tzinfo=datetime.timezone.utc),
+    ]
+    save_times(
+        str(path), ("replay",), array("q", map(to_micros, timestamps)), sample_cache_dir
+    )
+    times = load_times(str(path), ("replay",), sample_cache_dir)
+    assert times[1] == MISSING_TIME
+    assert [to_datetime(t) for t in times] == [
+        datetime.datetime(2014, 1, 4, 20, 0, 0, 123456),
+        None,
+        datetime.datetime(1960, 5, 1),
+        datetime.datetime(2014, 1, 4, 20, 0),
+    ]
@@ -0,0 +1,62 @@
+import csv
+import io
+import pickle
+
+from splunk_eventgen.lib.eventgensampleevents import SampleColumns, SampleEvents
+
+FIELDS = {"index": "main", "host": "web01", "source": "web.log", "sourcetype": "web"}
+
+
+def test_sample_events_dicts():
+    """Test events read like the per-event dicts sampleDict used to hold"""
+    events = SampleEvents(["a\n", "b\n", "c\n"], FIELDS)
+    assert len(events) == 3
+    assert events[1] == dict(FIELDS, _raw="b\n")
+    assert events[-1]["_raw"] == "c\n"
+    assert events[0:2] == [dict(FIELDS, _raw="a\n"), dict(FIELDS, _raw="b\n")]
+    assert [e["_raw"] for e in events] == ["a\n", "b\n", "c\n"]
+    assert events.average_size() == 2
+
+
+def test_sample_events_take():
+    """Test taking events copies only the lines and keeps sharing the fields"""
+    events = SampleEvents(["a\n", "b\n", "c\n"], FIELDS)
+    taken = events.take([2, 0, 2])
+    assert list(taken.iter_raws()) == ["c\n", "a\n", "c\n"]
+    assert taken.fields is events.fields
+
+
+def test_sample_events_pickle():
+    """Test the shared fields are pickled once, not once per event"""
+    raws = ["event %d\n" % i for i in range(1000)]
+    compact = len(pickle.dumps(SampleEvents(raws, FIELDS)))
+    dicts = len(pickle.dumps([dict(FIELDS, _raw=raw) for raw in raws]))
+    assert compact * 2 < dicts
+
+
+def test_sample_columns_rows():
+    """Test CSV columns read back as the rows csv.DictReader gives, with missing fields filled in"""
+    text = '_time,_raw,host\n1,"a",web01\n\n2,"b\n",web02\n3\n'
+    expected = []
+    for row in csv.DictReader(io.StringIO(text)):
+        row["_raw"] = (row["_raw"] or "") + (
+            "" if (row["_raw"] or "").endswith("\n") else "\n"
+        )
+        row.update({"index": "main", "source": "web.log", "sourcetype": "web"})
+        expected.append(row)
+    reader = csv.reader(io.StringIO(text))
+    columns = SampleColumns.from_rows(next(reader), reader, FIELDS)
+    assert list(columns) == expected
+    assert [list(row) for row in columns] == [list(row) for row in expected]
+    assert list(columns.column("host")) == ["web01", "web02", None]
+    assert list(columns.column("index")) == ["main"] * 3
+    taken = columns.take([1, 1])
+    assert taken[0] == expected[1]
+    assert list(taken.iter_raws()) == ["b\n", "b\n"]
+
+
+def test_sample_columns_interned():
+    """Test repeated metadata values are stored once"""
+    rows = [["event %d" % i, "".join(["web", "01"])] for i in range(10)]
+    columns = SampleColumns.from_rows(["_raw", "host"], rows, FIELDS)
+    assert len(set(id(host) for host in columns.columns["host"])) == 1
@@ -0,0 +1,78 @@
+import os
+import pickle
+
+import pytest
+
+from splunk_eventgen.lib.eventgensampleindex import SampleIndex, clear_sample_indexes
+
+
+@pytest.mark.parametrize(
+    "breaker", [r"[^\r\n\s]+", r"^\d{4}-\d{2}-\d{2}", r"\r*\n\r*\n"]
+)
+def test_sample_index_events(make_sample, tmp_path, breaker):
+    """Test a streamed sample has the same events as a loaded one"""
+    path = tmp_path / "stream.log"
+    path.write_bytes(
+        b"2020-01-01 first\n  continued\n\n2020-01-02 second\r\n"
+        b"\n2020-01-03 third\n\n\n2020-01-04 \xc3\xa9t\xc3\xa9"
+    )
+    streamed = make_sample(path, breaker=breaker, streamSample=True)
+    streamed = streamed.get_loaded_sample()
+    assert isinstance(streamed, SampleIndex)
+    loaded = make_sample(path, breaker=breaker)
+    loaded.loadSample()
+    assert list(streamed) == list(loaded.sampleDict)
+    assert streamed[1:3] == list(streamed)[1:3]
+    assert streamed[-1]["_raw"].endswith("été\n")
+
+
+def test_loaded_sample(make_sample, tmp_path):
+    """Test get_loaded_sample() returns the lines of a raw sample and the events of a streamed one"""
+    path = tmp_path / "stream.log"
+    path.write_text("a\n\nb")
+    sample = make_sample(path)
+    assert sample.get_loaded_sample() == ["a\n", "b\n"]
+    assert sample.sampleLines is sample.sampleDict.raws
+    copy = pickle.loads(pickle.dumps(sample))
+    assert copy.sampleLines is copy.sampleDict.raws
+    sample = make_sample(path, streamSample=True)
+    assert isinstance(sample.get_loaded_sample(), SampleIndex)
+
+
+def test_sample_index_saved(tmp_path, sample_cache_dir):
+    """Test offsets are saved once, reused and found again when the sample changes"""
+    path = tmp_path / "stream.log"
+    path.write_text("a\nb\n")
+    assert len(SampleIndex(str(path), sampleCacheDir=sample_cache_dir)) == 2
+    index_dir = os.path.join(sample_cache_dir, "index")
+    assert len(os.listdir(index_dir)) == 1
+    clear_sample_indexes()
+    assert [
+        e["_raw"] for e in SampleIndex(str(path), sampleCacheDir=sample_cache_dir)
+    ] == ["a\n", "b\n"]
+    path.write_text("a\nb\nc\n")
+    os.utime(str(path), ns=(0, 0))
+    assert len(SampleIndex(str(path), sampleCacheDir=sample_cache_dir)) == 3
+    assert len(os.listdir(index_dir)) == 1
+
+
+def test_sample_index_pickle(tmp_path):
+    """Test pickled indexes carry no events and map the file again"""
+    path = tmp_path / "stream.log"
+    path.write_text("x" * 1000 + "\n" + "y\n")
+    index = SampleIndex(str(path), fields={"index": "main"})
+    data = pickle.dumps(index)
+    assert len(data) < 500
+    copy = pickle.loads(data)
+    assert copy[1] == {"index": "main", "_raw": "y\n"}
+    assert copy.average_size() == 501.5
+
+
+def test_invalid_breaker(make_sample, tmp_path):
+    """Test a breaker that doesn't compile breaks events on lines"""
+    path = tmp_path / "stream.log"
+    path.write_text("a\nb\n")
+    for streamSample in (False, True):
+        sample = make_sample(path, breaker="(", streamSample=streamSample)
+        sample.loadSample()
+        assert [e["_raw"] for e in sample.sampleDict] == ["a\n", "b\n"]
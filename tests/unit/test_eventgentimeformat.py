@@ -0,0 +1,54 @@
+import datetime
+
+import pytest
+
+from splunk_eventgen.lib.eventgentimeformat import (
+    compile_time_format,
+    strftime,
+    strptime,
+)
+
+formats = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%d/%m/%y %H%M%S",
+    "%S%f",
+    "%Y %%f %m",
+    "%b %d %H:%M:%S",
+    "%s",
+]
+
+
+@pytest.mark.parametrize("fmt", formats)
+def test_time_format_matches_datetime(fmt):
+    """Test compiled formats parse and format like strptime and strftime, including what they reject"""
+    for timestamp in (
+        datetime.datetime(2021, 3, 4, 5, 6, 7, 890123),
+        datetime.datetime(1969, 12, 31, 23, 59, 59),
+        datetime.datetime(999, 1, 2, 3, 4, 5),
+    ):
+        text = timestamp.strftime(fmt)
+        assert strftime(timestamp, fmt) == text
+        for string in (text, text.replace("0", " ", 1), text[:-1], text + "1"):
+            try:
+                expected = datetime.datetime.strptime(string, fmt)
+            except ValueError:
+                with pytest.raises(ValueError):
+                    strptime(string, fmt)
+            else:
+                assert strptime(string, fmt) == expected
+
+
+def test_time_format_fallback():
+    """Test only formats of fixed width numeric fields are compiled"""
+    assert compile_time_format("%Y-%m-%d %H:%M:%S").fields is not None
+    assert compile_time_format("%b %d %H:%M:%S").fields is None
+    # Repeated fields are an error strptime reports
+    assert compile_time_format("%H %H").fields is None
+    assert strptime("2021-02-03 04:05:06", "%Y-%m-%d %H:%M:%S") == datetime.datetime(
+        2021, 2, 3, 4, 5, 6
+    )
+    # Single digit fields aren't fixed width, but strptime takes them
+    assert strptime("2021-2-3 4:05:06", "%Y-%m-%d %H:%M:%S") == datetime.datetime(
+        2021, 2, 3, 4, 5, 6
+    )
@@ -0,0 +1,31 @@
+import datetime
+import time
+
+from splunk_eventgen.lib.eventgentimestamp import EventgenTimestamp
+
+
+def test_format_timestamp_matches_strftime():
+    """Test cached formatting gives the same result as strftime for every microsecond"""
+    base = datetime.datetime(2021, 3, 4, 5, 6, 7)
+    fmt = "%Y-%m-%d %H:%M:%S.%f"
+    for microsecond in (0, 1, 500000, 999999):
+        timestamp = base.replace(microsecond=microsecond)
+        assert EventgenTimestamp.format_timestamp(timestamp, fmt) == timestamp.strftime(
+            fmt
+        )
+
+
+def test_format_timestamp_epoch():
+    """Test %s is replaced with the epoch second, including trailing zeros"""
+    timestamp = datetime.datetime.fromtimestamp(1600000000)
+    assert EventgenTimestamp.format_timestamp(timestamp, "%s") == "1600000000"
+    assert EventgenTimestamp.format_timestamp(
+        timestamp, "epoch=%s"
+    ) == "epoch=%d" % int(time.mktime(timestamp.timetuple()))
+
+
+def test_format_timestamp_literal_percent():
+    """Test a literal %%f is not treated as microseconds"""
+    timestamp = datetime.datetime(2021, 3, 4, 5, 6, 7, 123)
+    fmt = "%H:%M:%S %%f %f"
+    assert EventgenTimestamp.format_timestamp(timestamp, fmt) == timestamp.strftime(fmt)
@@ -0,0 +1,72 @@
+import re
+
+import pytest
+
+from splunk_eventgen.lib.eventgensamples import Sample
+from splunk_eventgen.lib.eventgentoken import Token
+
+
+def test_token_compile_once(make_token):
+    """Test the token regex is compiled once and recompiled when the token changes"""
+    t = make_token(r"user=(\w+)", "static", "admin")
+    compiled = t.compile()
+    assert t._search("user=bob").group(1) == "bob"
+    assert t._tokenRE is compiled
+    t.token = r"host=(\w+)"
+    assert t._tokenRE is None
+    assert t.replace("host=web01") == "host=admin"
+
+
+def test_token_compile_invalid(make_token):
+    """Test an invalid token regex raises ValueError"""
+    t = make_token(r"user=(\w+", "static", "admin")
+    with pytest.raises(ValueError):
+        t.compile()
+
+
+random_pattern_params = [
+    ("ipv4", r"^(?:\d{1,3}\.){3}\d{1,3}$"),
+    ("ipv6", r"^(?:[0-9a-f]{1,4}:){7}[0-9a-f]{1,4}$"),
+    ("mac", r"^(?:[0-9a-f]{2}:){5}[0-9a-f]{2}$"),
+    ("hex(7)", r"^[0-9A-F]{7}$"),
+    ("string(12)", r"^[A-Za-z0-9_.\-~/]{12}$"),
+]
+
+
+@pytest.mark.parametrize("replacement,pattern", random_pattern_params)
+def test_token_random_batch(make_token, replacement, pattern):
+    """Test batch generated random values have the same format as before"""
+    t = make_token(r"value=(\S+)", "random", replacement)
+    t.prefill(100)
+    assert len(t._getRandomBuffer()) == 100
+    for _ in range(200):
+        assert re.match(pattern, t._getReplacement()) is not None
+
+
+def test_token_mvfile_per_event(make_token, tmp_path):
+    """Test mvfile tokens share a line through the event's mvhash and not through the Token objects"""
+    path = tmp_path / "cities.csv"
+    path.write_text("Seattle,WA\nAustin,TX\nDenver,CO\n")
+    sample = Sample("mvfile")
+    sample.pathParser = lambda p: p
+    city = make_token(r"city=(\w+)", "mvfile", "%s:1" % path)
+    state = make_token(r"state=(\w+)", "mvfile", "%s:2" % path)
+    pairs = {("Seattle", "WA"), ("Austin", "TX"), ("Denver", "CO")}
+    for _ in range(20):
+        mvhash = {}
+        event = city.replace("city=X state=Y", s=sample, mvhash=mvhash)
+        event = state.replace(event, s=sample, mvhash=mvhash)
+        values = tuple(part.split("=")[1] for part in event.split())
+        assert values in pairs
+    assert not hasattr(Token, "mvhash")
+
+
+def test_token_rated_integer(make_token):
+    """Test rated integers are multiplied by the hour and day rates"""
+    sample = Sample("rated")
+    sample.hourOfDayRate = {str(hour): 2.0 for hour in range(24)}
+    sample.dayOfWeekRate = {str(day): 3.0 for day in range(7)}
+    assert sample.getTokenRateFactor() == 6.0
+    t = make_token(r"bytes=(\d+)", "rated", "integer[10:10]")
+    assert t.replace("bytes=1", s=sample) == "bytes=60"
+    assert t.replace("bytes=1", s=sample, rate_factor=0.5) == "bytes=5"
@@ -0,0 +1,219 @@
+import datetime
+import queue
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from splunk_eventgen.lib.plugins.generator import replay
+from splunk_eventgen.lib.plugins.generator.replay import ReplayGenerator
+
+
+@pytest.fixture
+def replay_sample(make_sample, make_token):
+    """Returns a function to create a replay sample of the file at path, with two timestamp formats"""
+
+    def _replay_sample(path):
+        return make_sample(
+            path,
+            timeField="_raw",
+            timeMultiple=2,
+            tokens=[
+                make_token(
+                    r"\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2}",
+                    "replaytimestamp",
+                    "%m/%d/%Y %H:%M:%S",
+                ),
+                make_token(
+                    r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}",
+                    "replaytimestamp",
+                    "%Y-%m-%d %H:%M:%S",
+                ),
+            ],
+        )
+
+    return _replay_sample
+
+
+def test_replay_time_deltas(replay_sample, tmp_path):
+    """Test time deltas skip events without a timestamp and the winning format is tried first"""
+    path = tmp_path / "replay.log"
+    path.write_text(
+        "2020-01-01 00:00:00 a\nno timestamp\n2020-01-01 00:00:05 b\n2020-01-01 00:00:06 c\n"
+    )
+    sample = replay_sample(path)
+    events = ReplayGenerator(sample).load_sample_file()
+    assert [e["_raw"] for e in events] == [
+        "2020-01-01 00:00:00 a\n",
+        "2020-01-01 00:00:05 b\n",
+        "2020-01-01 00:00:06 c\n",
+    ]
+    assert [e["timediff"] for e in events] == [
+        datetime.timedelta(),
+        datetime.timedelta(seconds=10),
+        datetime.timedelta(seconds=2),
+    ]
+    assert sample._timestampTokens[0] is sample.tokens[1]
+    # The parsed times are kept with the sample
+    times, timediffs = ReplayGenerator(sample).get_base_times(sample.sampleDict)
+    assert times is sample._baseTimes[1]
+    assert list(timediffs) == [0, 0, 5000000, 1000000]
+
+
+class _Clock(object):
+    def __init__(self, work):
+        self.now = 0.0
+        self.work = work
+
+    def monotonic(self):
+        # Every look at the clock costs some work, like replacing tokens does
+        self.now += self.work
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_replay_schedule(replay_sample, tmp_path, monkeypatch):
+    """Test events are sent on their timeline without drift, due events going out in one batch"""
+    path = tmp_path / "replay.log"
+    path.write_text(
+        "".join(
+            "2020-01-01 00:00:%02d e%d\n" % (second, i)
+            for i, second in enumerate([0, 0, 1, 1, 1, 3, 4])
+        )
+    )
+    sample = replay_sample(path)
+    sample.timeMultiple = 1
+    sample.hostToken = None
+    sample.replayTick = 0.5
+    generator = ReplayGenerator(sample)
+    generator.current_time = datetime.datetime(2021, 1, 1)
+    batches = []
+    generator._out = SimpleNamespace(bulksend=batches.append)
+    events = generator.load_sample_file()
+    clock = _Clock(0.01)
+    monkeypatch.setattr(replay, "time", clock)
+    generator.send_on_schedule(events, None, None)
+    assert [[e["_raw"].split()[-1] for e in batch] for batch in batches] == [
+        ["e0", "e1"],
+        ["e2", "e3", "e4"],
+        ["e5"],
+        ["e6"],
+    ]
+    assert batches[-1][0]["_time"] - batches[0][0]["_time"] == 4
+    # Sleeping to each deadline leaves no drift however many events came before
+    assert clock.now < 4.1
+
+
+def test_replay_partitions(replay_sample, tmp_path):
+    """Test partitions stay whole, are spread evenly and keep their offsets on the sample's timeline"""
+    path = tmp_path / "replay.log"
+    path.write_text(
+        "".join(
+            "2020-01-01 00:00:%02d host=%s e%d\n" % (i, host, i)
+            for i, host in enumerate(["a", "b", "a", "c", "b", "a", "d"])
+        )
+    )
+    sample = replay_sample(path)
+    sample.replayPartition = "_raw"
+    sample.replayPartitionRegex = r"host=(\w+)"
+    generator = ReplayGenerator(sample)
+    key = generator.partition_key()
+    lists = generator.partition_events(generator.load_sample_file(), key, 2)
+    raws = [[e["_raw"].split()[-1] for e in events] for events in lists]
+    assert raws == [["e0", "e2", "e5", "e6"], ["e1", "e3", "e4"]]
+    offsets = [
+        sum((e["timediff"] for e in events), datetime.timedelta()) for events in lists
+    ]
+    # timeMultiple 2 doubles the 6 and 4 seconds e6 and e4 are from the start
+    assert offsets == [datetime.timedelta(seconds=12), datetime.timedelta(seconds=8)]
+    sample.replayPartition = "nope"
+    assert generator.partition_key() is None
+
+
+def _partitioned_generator(replay_sample, tmp_path, monkeypatch, sent):
+    path = tmp_path / "replay.log"
+    path.write_text(
+        "".join(
+            "2020-01-01 00:00:%02d host=%s e%d\n" % (i, host, i)
+            for i, host in enumerate(["a", "b", "a", "c", "b", "a", "d"])
+        )
+    )
+    sample = replay_sample(path)
+    sample.hostToken = None
+    sample.replayPartition = "_raw"
+    sample.replayPartitionRegex = r"host=(\w+)"
+    output = SimpleNamespace(bulksend=sent.extend, flush=lambda endOfInterval: None)
+
+    def updateConfig(self, config, outqueue, replayLock=None):
+        self.config = config
+        self.outputQueue = outqueue
+        self._out = output
+
+    monkeypatch.setattr(ReplayGenerator, "updateConfig", updateConfig)
+    generator = ReplayGenerator(sample)
+    generator.updateCounts(count=-1, start_time=None, end_time=None)
+    generator.updateConfig(
+        SimpleNamespace(generatorWorkers=2, stopping=False), outqueue=None
+    )
+    generator.current_time = datetime.datetime(2021, 1, 1)
+    generator.generatorQueue = queue.Queue()
+    return generator
+
+
+def test_replay_partitions_merged(replay_sample, tmp_path, monkeypatch):
+    """
+    Test the replay sends one partition itself while a single other worker sends the other, which reports back on the
+    done queue, and their events add up to the whole sample
+    """
+    sent = []
+    generator = _partitioned_generator(replay_sample, tmp_path, monkeypatch, sent)
+    events = generator.load_sample_file()
+    monkeypatch.setattr(replay, "time", _Clock(0.01))
+    done = queue.Queue()
+    monkeypatch.setattr(generator, "done_queue", lambda: done)
+    runs = []
+
+    def worker():
+        run = generator.generatorQueue.get(timeout=5)
+        runs.append(run)
+        run.gen(run.count, None, None)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    assert (
+        generator.replay_partitions(events, generator.partition_key(), None, None) == 7
+    )
+    thread.join()
+    assert len(runs) == 1
+    assert runs[0]._partition[2] is done
+    assert generator.generatorQueue.empty()
+    assert done.empty()
+    assert sorted(e["_raw"].split()[-1] for e in sent) == ["e%d" % i for i in range(7)]
+
+
+def test_replay_partitions_deadline(replay_sample, tmp_path, monkeypatch):
+    """Test a replay stops waiting for partitions which never run once its timeline and grace have passed"""
+    sent = []
+    generator = _partitioned_generator(replay_sample, tmp_path, monkeypatch, sent)
+    events = generator.load_sample_file()
+    # Every look at the clock is past the 12 second timeline plus the grace
+    monkeypatch.setattr(replay, "time", _Clock(100))
+    monkeypatch.setattr(replay, "PARTITION_GRACE", 1)
+    assert (
+        generator.replay_partitions(events, generator.partition_key(), None, None) == 4
+    )
+    # Only the partition the replay sent itself
+    assert [e["_raw"].split()[-1] for e in sent] == ["e0", "e2", "e5", "e6"]
+    assert generator.generatorQueue.qsize() == 1
+
+
+def test_replay_partitions_empty(replay_sample, tmp_path, monkeypatch):
+    """Test a sample without events to replay sends nothing and queues no partition"""
+    generator = _partitioned_generator(replay_sample, tmp_path, monkeypatch, [])
+    assert (
+        generator.replay_partitions(iter([]), generator.partition_key(), None, None)
+        == 0
+    )
+    assert generator.generatorQueue.empty()